@@ -4,34 +4,48 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from config import LOG_LEVEL
+from db_routing import RoutingSession, init_routing
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=LOG_LEVEL)
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
+
+def create_app():
+    """
+    Build and configure the Flask application.
+    Nothing here connects to the database: the engine opens its first
+    connection on the first query, and the schema is managed separately
+    by `flask --app main upgrade-db` (see migrations.py).
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "temp-dev-key-for-migration-please-set-session-secret")
+    # needed for url_for to generate with https, and remote_addr is the client behind the proxy
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
+
+    # Configure the database; pool options and the optional read replica come from config
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///logistics.db")
+
+    # Initialize the app with the extension and read/write routing
+    init_routing(app, db)
+    return app
 
 # Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "temp-dev-key-for-migration-please-set-session-secret")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # needed for url_for to generate with https
-
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///logistics.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# Initialize the app with the extension
-db.init_app(app)
-
-with app.app_context():
-    # Import models here to ensure tables are created
-    import models
-    db.create_all()
+app = create_app()
+
+# Models and schema migrations (CLI commands only, no DDL at import)
+import models
+import migrations
+
+# Request and query instrumentation
+import instrumentation
+
+# Fingerprinted static assets (asset_url template helper, /assets/)
+import assets
 
 # Import routes after app creation
 import routes
@@ -0,0 +1,128 @@
+"""
+Archival of delivered requests.
+
+Delivered requests whose status has not changed for ARCHIVE_AFTER_DAYS move
+from request to request_archive (monthly range partitions on PostgreSQL,
+created as needed), so the table behind the dashboard, tracking and every
+insert only holds live orders and its indexes stay small. Each batch copies
+and deletes its rows in one short transaction: a run can be interrupted at
+any point and the next one continues with whatever is still eligible.
+"""
+
+import time
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy import func, text
+
+from app import app, db
+from models import NotificationOutbox, Request, RequestArchive, RequestEvent
+from cache import invalidate_tracking
+from status_counters import adjust_status_counter
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_BATCH_PAUSE
+
+ARCHIVED_COLUMNS = [column.key for column in Request.__table__.columns]
+
+def _month(value):
+    return date(value.year, value.month, 1)
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def partition_name(month):
+    return f'request_archive_{month:%Y_%m}'
+
+def ensure_partitions(months):
+    """Create monthly archive partitions on PostgreSQL, no-op on other databases (caller commits)"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for month in sorted(set(months)):
+        db.session.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF request_archive '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        ))
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move one batch of delivered requests into the archive (commits)
+
+    Args:
+        cutoff: Requests delivered before this datetime are archived
+        batch_size: Maximum requests moved in this transaction
+
+    Returns:
+        Number of archived requests, 0 when nothing is left
+    """
+    now = datetime.utcnow()
+    rows = db.session.query(Request.id, Request.created_at, Request.employee_id,
+                            Request.customer_phone_normalized).filter(
+        Request.status == 'delivered',
+        func.coalesce(Request.status_changed_at, Request.created_at) < cutoff,
+    ).order_by(Request.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+    ids = [row.id for row in rows]
+
+    ensure_partitions(_month(row.created_at or now) for row in rows)
+    source = Request.__table__.c
+    db.session.execute(db.insert(RequestArchive.__table__).from_select(
+        ARCHIVED_COLUMNS + ['archived_at'],
+        db.select(*[func.coalesce(source.created_at, now) if key == 'created_at' else source[key]
+                    for key in ARCHIVED_COLUMNS], db.literal(now, db.DateTime))
+        .where(source.id.in_(ids)),
+    ))
+
+    # Rows that point at the request: stream events are transient, sent notifications keep their payload
+    RequestEvent.query.filter(RequestEvent.request_id.in_(ids)).delete(synchronize_session=False)
+    NotificationOutbox.query.filter(NotificationOutbox.request_id.in_(ids)) \
+        .update({NotificationOutbox.request_id: None}, synchronize_session=False)
+    Request.query.filter(Request.id.in_(ids)).delete(synchronize_session=False)
+
+    # Status counters describe the live table the dashboard lists
+    per_employee = {}
+    for row in rows:
+        per_employee[row.employee_id] = per_employee.get(row.employee_id, 0) + 1
+    for employee_id, count in per_employee.items():
+        adjust_status_counter(employee_id, 'delivered', -count)
+
+    db.session.commit()
+    for phone in {row.customer_phone_normalized for row in rows}:
+        invalidate_tracking(phone)
+    return len(ids)
+
+def archive_requests(days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None,
+                     pause=ARCHIVE_BATCH_PAUSE):
+    """
+    Archive delivered requests older than `days` in batches
+
+    Returns:
+        Number of archived requests
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        archived += moved
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return archived
+
+def archived_tracking_query(normalized_phone):
+    """Archived requests of a phone number, for tracking when it has no live ones"""
+    return RequestArchive.query.filter_by(customer_phone_normalized=normalized_phone)
+
+@app.cli.command('archive-requests')
+@click.option('--days', type=int, default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive requests delivered more than this many days ago')
+@click.option('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, show_default=True)
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches')
+def archive_requests_command(days, batch_size, max_batches):
+    """Move old delivered requests into request_archive"""
+    started = time.perf_counter()
+    archived = archive_requests(days, batch_size, max_batches)
+    click.echo(f"Archived {archived} delivered requests ({time.perf_counter() - started:.1f}s)")
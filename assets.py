@@ -0,0 +1,208 @@
+"""
+Fingerprinted static assets.
+
+`flask --app main build-assets` minifies CSS/JS from static/, writes each
+file as name.<content hash>.ext into static/dist with gzip (and brotli, when
+the brotli package is installed) variants next to it, and records the
+mapping in static/dist/manifest.json. Templates link assets through
+asset_url(), which falls back to the plain static URL for files that were
+not built, and /assets/ serves the precompressed variant the client accepts
+with an immutable Cache-Control: a new build changes the URL instead.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+from app import app
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always built
+    brotli = None
+
+STATIC_DIR = os.path.join(app.root_path, 'static')
+ASSETS_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_FILE = os.path.join(ASSETS_DIR, 'manifest.json')
+HASH_LENGTH = 12
+ASSET_MAX_AGE = 365 * 24 * 3600
+# Already compressed formats are only fingerprinted
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt'}
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_STRING = r'"(?:\\.|[^"\\])*"|' + r"'(?:\\.|[^'\\])*'"
+_STRING_OR_COMMENT = re.compile(rf'({_STRING})|/\*.*?\*/', re.S)
+_STRINGS = re.compile(rf'({_STRING})', re.S)
+
+def minify_css(text):
+    """Drop comments and redundant whitespace outside of string literals"""
+    text = _STRING_OR_COMMENT.sub(lambda match: match.group(1) or '', text)
+    # Odd items are string literals and stay untouched
+    parts = _STRINGS.split(text)
+    return ''.join(part if index % 2 else _squeeze_css(part) for index, part in enumerate(parts)).strip() + '\n'
+
+def _squeeze_css(chunk):
+    chunk = re.sub(r'\s+', ' ', chunk)
+    chunk = re.sub(r' ?([{};,>]) ?', r'\1', chunk)
+    return chunk.replace(';}', '}')
+
+def minify_js(text):
+    """
+    Line-level minification that cannot change behaviour: indentation, blank
+    lines and whole-line comments go, line breaks stay (automatic semicolon
+    insertion), lines inside multi-line template literals are kept verbatim
+    """
+    lines = []
+    in_template = False
+    in_comment = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if in_template:
+            lines.append(line)
+        elif in_comment:
+            in_comment = '*/' not in stripped
+            continue
+        elif not stripped or stripped.startswith('//'):
+            continue
+        elif stripped.startswith('/*'):
+            in_comment = '*/' not in stripped
+            continue
+        else:
+            lines.append(stripped)
+        if line.count('`') % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+def _source_files():
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if os.path.abspath(root) == os.path.abspath(STATIC_DIR):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != ASSETS_DIR]
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, '/'), path
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def build_assets():
+    """
+    Minify, fingerprint and precompress everything under static/
+
+    Returns:
+        dict: manifest {source path: fingerprinted path}, both relative to the asset roots
+    """
+    manifest = {}
+    for name, path in _source_files():
+        base, ext = os.path.splitext(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if ext in MINIFIERS:
+            data = MINIFIERS[ext](data.decode('utf-8')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        built = f'{base}.{digest}{ext}'
+        target = os.path.join(ASSETS_DIR, built)
+        if not os.path.exists(target):
+            _write(target, data)
+            if ext in COMPRESSIBLE:
+                # mtime=0 keeps the .gz byte-identical across builds
+                _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(target + '.br', brotli.compress(data, quality=11))
+        manifest[name] = built
+
+    _write(MANIFEST_FILE, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _manifest_cache.clear()
+    return manifest
+
+def clean_assets(*manifests):
+    """Remove built files that none of the given manifests references"""
+    keep = {os.path.join(ASSETS_DIR, built) for manifest in manifests for built in manifest.values()}
+    removed = 0
+    for root, _, files in os.walk(ASSETS_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if path == MANIFEST_FILE:
+                continue
+            for suffix in ('.gz', '.br'):
+                if path.endswith(suffix):
+                    path_source = path[:-len(suffix)]
+                    break
+            else:
+                path_source = path
+            if path_source not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+_manifest_cache = {}
+
+def load_manifest():
+    """Manifest of the last build, {} when assets were not built"""
+    if 'manifest' not in _manifest_cache:
+        try:
+            with open(MANIFEST_FILE, encoding='utf-8') as f:
+                _manifest_cache['manifest'] = json.load(f)
+        except (OSError, ValueError):
+            _manifest_cache['manifest'] = {}
+    return _manifest_cache['manifest']
+
+@app.template_global()
+def asset_url(filename, **values):
+    """
+    URL of a static file, fingerprinted when it was built
+
+    Takes the same arguments as url_for('static', filename=...).
+    """
+    built = load_manifest().get(filename)
+    if built is None:
+        return url_for('static', filename=filename, **values)
+    return url_for('serve_asset', filename=built, **values)
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Fingerprinted asset, precompressed when the client accepts it"""
+    path = safe_join(ASSETS_DIR, filename)
+    if path is None or not os.path.isfile(path) or path == MANIFEST_FILE:
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    digest = os.path.splitext(os.path.splitext(filename)[0])[1].lstrip('.')
+
+    encoding = None
+    for candidate, suffix in ENCODINGS:
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetype, etag=f'{digest}-{encoding or "identity"}',
+                         max_age=ASSET_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
+@app.cli.command('build-assets')
+@click.option('--clean', is_flag=True, help='Remove files of builds before the previous one')
+def build_assets_command(clean):
+    """Minify, fingerprint and precompress static assets into static/dist"""
+    previous = load_manifest()
+    manifest = build_assets()
+    click.echo(f"Built {len(manifest)} assets into {ASSETS_DIR}"
+               f"{'' if brotli else ' (brotli not installed, gzip only)'}")
+    if clean:
+        # Pages rendered by the previous release may still be open, keep its files
+        click.echo(f"Removed {clean_assets(manifest, previous)} stale files")
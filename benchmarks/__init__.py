@@ -0,0 +1,10 @@
+"""
+Load-test and benchmark suite for the core routes.
+
+    python -m benchmarks.seed --database sqlite:///bench.db --employees 10000 --requests 5000000
+    python -m benchmarks.run --database sqlite:///bench.db --concurrency 8 --duration 20 --output bench.json
+    python -m benchmarks.coldstart --database sqlite:///bench.db --samples 20
+
+The app's environment is configured by benchmarks.env before it is imported,
+so the modules here import app lazily.
+"""
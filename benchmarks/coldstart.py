@@ -0,0 +1,89 @@
+"""
+Measure cold start of main:app the way a fresh gunicorn worker sees it:
+each sample is a new interpreter that imports main and serves one request
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks.env import configure
+from benchmarks.run import git_revision, percentile
+
+# Runs in the child interpreter; SQL is counted from before the first app import
+CHILD = r'''
+import json, time
+start = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+import main
+imported = time.perf_counter()
+import_statements = len(statements)
+response = main.app.test_client().get(PATH)
+response.close()
+served = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - start,
+    'first_response_s': served - imported,
+    'total_s': served - start,
+    'import_sql_statements': import_statements,
+    'status': response.status_code,
+}))
+'''
+
+def sample(path, cwd):
+    """One cold start in a fresh interpreter"""
+    output = subprocess.check_output([sys.executable, '-c', f'PATH = {path!r}\n' + CHILD],
+                                     cwd=cwd, env=os.environ.copy(), text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarize(samples, key):
+    values = sorted(s[key] * 1000 for s in samples)
+    return {
+        'p50_ms': round(percentile(values, 0.50), 1),
+        'p95_ms': round(percentile(values, 0.95), 1),
+        'max_ms': round(values[-1], 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database', required=True, help='SQLAlchemy URL of an upgraded database')
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--path', default='/', help='Route requested after the import')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    configure(args.database)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # The first interpreter start warms the OS file cache and .pyc files
+    sample(args.path, root)
+    samples = [sample(args.path, root) for _ in range(args.samples)]
+
+    report = {
+        'started_at': datetime.utcnow().isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'database': args.database.split(':', 1)[0],
+        'samples': len(samples),
+        'path': args.path,
+        'import': summarize(samples, 'import_s'),
+        'first_response': summarize(samples, 'first_response_s'),
+        'total': summarize(samples, 'total_s'),
+        'import_sql_statements': max(s['import_sql_statements'] for s in samples),
+        'errors': sum(1 for s in samples if s['status'] >= 400),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
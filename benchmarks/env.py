@@ -0,0 +1,26 @@
+"""
+Environment shared by the benchmark commands
+"""
+
+import os
+
+BENCH_PASSWORD = 'benchpass'
+BENCH_USERNAME = 'bench{}'
+# Customer phones are 7700 followed by a 7 digit customer number
+PHONE_PREFIX = '7700'
+
+def configure(database_url, telegram_url=None):
+    """Point the app at the benchmark database and Telegram stub; call before importing app"""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+    # All load comes from one client IP and a sample of phones: measure submissions, not 429s
+    os.environ.setdefault('SUBMIT_IP_BURST', '0')
+    os.environ.setdefault('SUBMIT_PHONE_BURST', '0')
+    if telegram_url:
+        os.environ['TELEGRAM_API_URL'] = telegram_url
+        os.environ['TELEGRAM_BOT_TOKEN'] = 'benchmark-token'
+        os.environ['TELEGRAM_CHAT_ID'] = '1'
+
+def customer_phone(number):
+    return f'{PHONE_PREFIX}{number:07d}'
@@ -0,0 +1,194 @@
+"""
+Drive the core routes at a fixed concurrency and report latency percentiles
+and throughput per route as JSON
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks.env import BENCH_PASSWORD, configure
+from benchmarks.telegram_stub import start_stub
+
+ROUTES = ['index', 'submit_request', 'track_order', 'dashboard', 'update_request_status']
+SAMPLE_SIZE = 1000
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    ms = [value * 1000 for value in latencies]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(ms, 0.50), 3) if ms else None,
+        'p95_ms': round(percentile(ms, 0.95), 3) if ms else None,
+        'p99_ms': round(percentile(ms, 0.99), 3) if ms else None,
+        'max_ms': round(ms[-1], 3) if ms else None,
+    }
+
+class Workload:
+    """Sampled fixtures and one request per route"""
+
+    def __init__(self, app, db):
+        from models import Employee, Request
+
+        self.app = app
+        with app.app_context():
+            self.phones = [row.customer_phone for row in db.session.query(Request.customer_phone)
+                           .order_by(db.func.random()).limit(SAMPLE_SIZE)]
+            self.usernames = [row.username for row in db.session.query(Employee.username)
+                              .filter(Employee.username.like('bench%'))
+                              .order_by(db.func.random()).limit(SAMPLE_SIZE)]
+            db.session.rollback()
+        if not self.phones or not self.usernames:
+            raise SystemExit('Benchmark database is empty, run benchmarks.seed first')
+
+    def client(self, rng):
+        """A logged-in test client with some of its employee's request ids"""
+        from app import db
+        from models import Employee, Request
+
+        client = self.app.test_client()
+        username = rng.choice(self.usernames)
+        client.post('/login', data={'username': username, 'password': BENCH_PASSWORD})
+        with self.app.app_context():
+            employee = Employee.query.filter_by(username=username).first()
+            request_ids = [row.id for row in db.session.query(Request.id)
+                           .filter(Request.employee_id == employee.id).limit(100)]
+            db.session.rollback()
+        return client, request_ids
+
+    def call(self, route, client, request_ids, rng):
+        """Issue one request, returns True on an expected status code"""
+        if route == 'index':
+            response = client.get('/')
+        elif route == 'submit_request':
+            # Unique across threads and repeated runs, so duplicate detection never short-circuits
+            unique = uuid.uuid4().hex
+            response = client.post('/submit_request', data={
+                'customer_name': f'Нагрузочный тест {unique}',
+                'customer_phone': rng.choice(self.phones),
+                'customer_address': 'г. Астана, ул. Тестовая, 1',
+                'delivery_type': rng.choice(['astana', 'regions']),
+                'cargo_description': f'Тестовый груз {unique}',
+                'cargo_weight': '12.5',
+            })
+        elif route == 'track_order':
+            response = client.post('/track_order', data={'customer_phone': rng.choice(self.phones)})
+        elif route == 'dashboard':
+            response = client.get('/dashboard')
+        elif route == 'update_request_status':
+            if not request_ids:
+                response = client.get('/dashboard')
+            else:
+                status = rng.choice(['processing', 'shipped'])
+                response = client.get(f'/update_request_status/{rng.choice(request_ids)}/{status}')
+        else:
+            raise ValueError(f'Unknown route: {route}')
+        response.close()
+        return response.status_code < 400
+
+def run_route(workload, route, concurrency, duration, warmup, seed):
+    """Run one route from `concurrency` threads and summarize the measured window"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency)
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client, request_ids = workload.client(rng)
+        ready.wait()
+        local = []
+        local_errors = 0
+        measure_from = time.perf_counter() + warmup
+        deadline = measure_from + duration
+        while True:
+            begin = time.perf_counter()
+            if begin >= deadline:
+                break
+            try:
+                ok = workload.call(route, client, request_ids, rng)
+            except Exception:
+                ok = False
+            end = time.perf_counter()
+            if begin >= measure_from:
+                local.append(end - begin)
+                local_errors += 0 if ok else 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], duration)
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database', required=True, help='SQLAlchemy URL of a database filled by benchmarks.seed')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='Comma separated subset of ' + ', '.join(ROUTES))
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds per route')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds per route')
+    parser.add_argument('--telegram-latency', type=float, default=0.05, help='Stub response delay in seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(args.telegram_latency)
+    configure(args.database, stub_url)
+
+    from app import app, db
+    app.config['WTF_CSRF_ENABLED'] = False
+    workload = Workload(app, db)
+    with app.app_context():
+        dialect = db.engine.dialect.name
+
+    report = {
+        'started_at': datetime.utcnow().isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'database': dialect,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'warmup_s': args.warmup,
+        'routes': {},
+    }
+    for route in [route.strip() for route in args.routes.split(',') if route.strip()]:
+        report['routes'][route] = run_route(workload, route, args.concurrency, args.duration, args.warmup, args.seed)
+        print(f"{route}: {json.dumps(report['routes'][route])}", flush=True)
+    report['telegram_stub_calls'] = stub.calls
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
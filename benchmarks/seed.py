@@ -0,0 +1,101 @@
+"""
+Fill a database with realistic volumes of employees and requests
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.env import BENCH_PASSWORD, BENCH_USERNAME, configure, customer_phone
+
+STATUSES = ['pending', 'processing', 'shipped', 'delivered']
+STATUS_WEIGHTS = [5, 5, 10, 80]
+STREETS = ['Кенесары', 'Абая', 'Республики', 'Туран', 'Мангилик Ел', 'Сарыарка', 'Кабанбай батыра']
+CARGO = ['Хромированные детали', 'Стройматериалы', 'Мебель', 'Оборудование', 'Документы', 'Запчасти']
+
+def seed(employees, requests, customers, history_days, batch_size, random_seed):
+    from app import app, db
+    from migrations import upgrade
+    from models import Employee, Request, normalize_phone
+    from status_counters import rebuild_status_counters
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+
+    with app.app_context():
+        upgrade()
+        start = time.perf_counter()
+
+        # One hash for everybody, hashing thousands of passwords would dominate seeding
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+        first_employee = (db.session.query(db.func.max(Employee.id)).scalar() or 0) + 1
+        for offset in range(0, employees, batch_size):
+            rows = []
+            for i in range(first_employee + offset, first_employee + min(offset + batch_size, employees)):
+                rows.append({
+                    'username': BENCH_USERNAME.format(i),
+                    'email': f'bench{i}@example.kz',
+                    'phone': f'+7701{i:07d}',
+                    'password_hash': password_hash,
+                    'created_at': now - timedelta(days=history_days),
+                })
+            db.session.execute(db.insert(Employee), rows)
+            db.session.commit()
+        employee_ids = [row.id for row in db.session.query(Employee.id)]
+        print(f'{employees} employees in {time.perf_counter() - start:.1f}s')
+
+        start = time.perf_counter()
+        history = timedelta(days=history_days).total_seconds()
+        for offset in range(0, requests, batch_size):
+            rows = []
+            for _ in range(min(batch_size, requests - offset)):
+                phone = customer_phone(rng.randrange(customers))
+                status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+                created_at = now - timedelta(seconds=rng.uniform(0, history))
+                rows.append({
+                    'customer_name': f'Клиент {rng.randrange(1_000_000)}',
+                    'customer_phone': phone,
+                    'customer_phone_normalized': normalize_phone(phone),
+                    'customer_address': f'г. Астана, ул. {rng.choice(STREETS)}, {rng.randrange(1, 200)}',
+                    'delivery_type': 'astana' if rng.random() < 0.6 else 'regions',
+                    'cargo_description': rng.choice(CARGO),
+                    'cargo_weight': round(rng.uniform(1, 1500), 1),
+                    'cargo_volume': round(rng.uniform(0.01, 20), 2),
+                    'special_instructions': None,
+                    'preferred_delivery_date': None,
+                    'status': status,
+                    'created_at': created_at,
+                    'status_changed_at': created_at if status == 'pending' else None,
+                    # Roughly a third of requests are anonymous submissions
+                    'employee_id': rng.choice(employee_ids) if employee_ids and rng.random() < 0.7 else None,
+                })
+            db.session.execute(db.insert(Request), rows)
+            db.session.commit()
+            done = offset + len(rows)
+            if done % (batch_size * 50) == 0 or done == requests:
+                elapsed = time.perf_counter() - start
+                print(f'{done} requests in {elapsed:.1f}s ({done / elapsed:.0f} rows/s)')
+
+        rebuild_status_counters()
+        # Fresh planner statistics on both SQLite and PostgreSQL
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database', required=True, help='SQLAlchemy URL of the benchmark database')
+    parser.add_argument('--employees', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=5_000_000)
+    parser.add_argument('--customers', type=int, default=1_000_000, help='Distinct customer phone numbers')
+    parser.add_argument('--history-days', type=int, default=730)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    configure(args.database)
+    seed(args.employees, args.requests, args.customers, args.history_days, args.batch_size, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Local stand-in for api.telegram.org that accepts every call
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.calls += 1
+        method = self.path.rsplit('/', 1)[-1]
+        result = {'first_name': 'Benchmark'} if method == 'getMe' else {'message_id': self.server.calls}
+        body = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub(latency=0.0, port=0):
+    """
+    Serve the stub from a background thread
+
+    Returns:
+        tuple: (server, base_url)
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), TelegramStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.calls = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name='telegram-stub', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering')
+    args = parser.parse_args()
+    server, url = start_stub(args.latency, args.port)
+    print(f'Telegram stub listening on {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
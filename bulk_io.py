@@ -0,0 +1,209 @@
+"""
+Bulk import and export of shipping requests as CSV or JSON Lines
+"""
+
+import csv
+import io
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from werkzeug.datastructures import MultiDict
+
+from app import app, db
+from cache import invalidate_tracking
+from capacity import adjust_capacity
+from forms import RequestForm
+from models import Request, normalize_phone
+from status_counters import adjust_status_counter
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+# Columns accepted on import, in the order they are exported
+IMPORT_FIELDS = [
+    'customer_name',
+    'customer_phone',
+    'customer_address',
+    'delivery_type',
+    'cargo_description',
+    'cargo_weight',
+    'cargo_volume',
+    'special_instructions',
+    'preferred_delivery_date',
+]
+EXPORT_FIELDS = ['id'] + IMPORT_FIELDS + ['status', 'created_at', 'employee_id']
+
+def detect_format(filename, default='csv'):
+    """Pick 'csv' or 'jsonl' from a file name"""
+    name = (filename or '').lower()
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+def iter_rows(stream, fmt):
+    """
+    Parse an uploaded text stream row by row
+
+    Yields:
+        tuple: (line_number: int, row: dict or None, error: str or None)
+    """
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, row, None
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+
+def validate_row(row):
+    """
+    Validate one row with the same rules as the public request form
+
+    Returns:
+        tuple: (values: dict or None, errors: dict)
+    """
+    formdata = MultiDict({
+        field: str(row[field]) for field in IMPORT_FIELDS
+        if row.get(field) not in (None, '')
+    })
+    form = RequestForm(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    return {field: getattr(form, field).data for field in IMPORT_FIELDS}, {}
+
+def _insert_batch(batch, employee_id):
+    """Insert validated rows with one executemany and update derived data"""
+    now = datetime.utcnow()
+    for values in batch:
+        values['customer_phone_normalized'] = normalize_phone(values['customer_phone'])
+        values['status'] = 'pending'
+        values['created_at'] = now
+        values['employee_id'] = employee_id
+    db.session.execute(db.insert(Request), batch)
+    adjust_status_counter(employee_id, 'pending', len(batch))
+    booked = defaultdict(lambda: [0, 0.0, 0.0])
+    for values in batch:
+        if values.get('preferred_delivery_date'):
+            day = booked[(values['preferred_delivery_date'], values['delivery_type'])]
+            day[0] += 1
+            day[1] += values.get('cargo_weight') or 0.0
+            day[2] += values.get('cargo_volume') or 0.0
+    for (delivery_date, delivery_type), (count, weight, volume) in booked.items():
+        adjust_capacity(delivery_date, delivery_type, weight, volume, count)
+    db.session.commit()
+    for phone in {values['customer_phone_normalized'] for values in batch}:
+        invalidate_tracking(phone)
+
+def import_requests(stream, fmt, employee_id=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Validate and insert requests from a CSV/JSONL stream in batches.
+    Invalid rows are reported and skipped, valid rows are still imported.
+
+    Returns:
+        dict: {'imported': int, 'failed': int, 'errors': [{'line': int, 'errors': ...}]}
+    """
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+    for line_number, row, parse_error in iter_rows(stream, fmt):
+        if parse_error:
+            values, errors = None, {'row': [parse_error]}
+        else:
+            values, errors = validate_row(row)
+        if errors:
+            report['failed'] += 1
+            report['errors'].append({'line': line_number, 'errors': errors})
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            _insert_batch(batch, employee_id)
+            report['imported'] += len(batch)
+            batch = []
+    if batch:
+        _insert_batch(batch, employee_id)
+        report['imported'] += len(batch)
+    logger.info(f"Imported {report['imported']} requests, {report['failed']} rows rejected")
+    return report
+
+def _export_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def export_requests(fmt, employee_id=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream requests as CSV or JSONL text chunks, oldest first.
+    Rows are read through a server-side cursor so memory stays flat.
+
+    Yields:
+        str chunks
+    """
+    columns = [getattr(Request, field) for field in EXPORT_FIELDS]
+    query = db.select(*columns).order_by(Request.id)
+    if employee_id is not None:
+        query = query.where(Request.employee_id == employee_id)
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(EXPORT_FIELDS)
+
+    for rows in result.partitions():
+        for row in rows:
+            values = [_export_value(value) for value in row]
+            if fmt == 'jsonl':
+                record = {field: (value if value != '' else None) for field, value in zip(EXPORT_FIELDS, values)}
+                buffer.write(json.dumps(record, ensure_ascii=False))
+                buffer.write('\n')
+            else:
+                writer.writerow(values)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    remainder = buffer.getvalue()
+    if remainder:
+        yield remainder
+
+@app.cli.command('import-requests')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension')
+@click.option('--employee-id', type=int, help='Assign imported requests to this employee')
+@click.option('--batch-size', type=int, default=IMPORT_BATCH_SIZE, show_default=True)
+def import_requests_command(path, fmt, employee_id, batch_size):
+    """Import requests from a CSV or JSONL file"""
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        report = import_requests(stream, fmt or detect_format(path), employee_id, batch_size)
+    for error in report['errors']:
+        click.echo(f"line {error['line']}: {json.dumps(error['errors'], ensure_ascii=False)}", err=True)
+    click.echo(f"Imported {report['imported']} requests, {report['failed']} rows rejected")
+
+@app.cli.command('export-requests')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension')
+@click.option('--employee-id', type=int, help='Only export requests of this employee')
+def export_requests_command(path, fmt, employee_id):
+    """Export requests to a CSV or JSONL file"""
+    with open(path, 'w', newline='', encoding='utf-8') as stream:
+        for chunk in export_requests(fmt or detect_format(path), employee_id):
+            stream.write(chunk)
+    click.echo(f"Exported requests to {path}")
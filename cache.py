@@ -0,0 +1,224 @@
+"""
+Small key-value caches with TTL and LRU eviction.
+
+MemoryCache lives inside one process. SQLiteCache keeps entries in a local
+SQLite file so all gunicorn workers on the host share them. Both expose the
+same get/set/add/delete/get_or_set/stats interface.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app import app
+from config import TRACKING_CACHE_BACKEND, TRACKING_CACHE_TTL, TRACKING_CACHE_MAX_ENTRIES
+
+_MISSING = object()
+
+class BaseCache:
+    """Shared read-through logic and hit/miss accounting"""
+
+    def __init__(self, default_ttl, max_entries):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        value = self._get(key)
+        self._count(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def get_or_set(self, key, loader, ttl=None):
+        """Return the cached value or compute it with loader() and store it"""
+        value = self._get(key)
+        self._count(value is not _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        """Hit/miss counters of this process and current entry count"""
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'backend': type(self).__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'entries': len(self),
+            'max_entries': self.max_entries,
+        }
+
+class MemoryCache(BaseCache):
+    """Per-process LRU cache"""
+
+    def __init__(self, default_ttl=TRACKING_CACHE_TTL, max_entries=TRACKING_CACHE_MAX_ENTRIES):
+        super().__init__(default_ttl, max_entries)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """Store value unless the key holds an unexpired entry; True if stored"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] >= now:
+                return False
+            self._data[key] = (now + (ttl or self.default_ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class SQLiteCache(BaseCache):
+    """LRU cache in a local SQLite file shared by all worker processes"""
+
+    def __init__(self, path, default_ttl=TRACKING_CACHE_TTL, max_entries=TRACKING_CACHE_MAX_ENTRIES):
+        super().__init__(default_ttl, max_entries)
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or forked processes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, key):
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute('SELECT value, expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return _MISSING
+        if row[1] < now:
+            conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return _MISSING
+        conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + (ttl or self.default_ttl), now),
+        )
+        self._evict(conn)
+
+    def add(self, key, value, ttl=None):
+        """Store value unless the key holds an unexpired entry; True if stored"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute('DELETE FROM cache WHERE key = ? AND expires_at < ?', (key, now))
+        # The primary key makes this atomic across workers: only one insert wins
+        stored = conn.execute(
+            'INSERT OR IGNORE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + (ttl or self.default_ttl), now),
+        ).rowcount == 1
+        if stored:
+            self._evict(conn)
+        return stored
+
+    def _evict(self, conn):
+        conn.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+        )
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+def create_cache(backend, **options):
+    """
+    Build a cache from a backend spec
+
+    Args:
+        backend: 'memory' or 'sqlite:///path/to/cache.db'
+
+    Returns:
+        Cache instance
+    """
+    if backend == 'memory':
+        return MemoryCache(**options)
+    if backend.startswith('sqlite:///'):
+        return SQLiteCache(backend[len('sqlite:///'):], **options)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+def _default_tracking_backend():
+    # invalidate_tracking must reach every worker, so the default is shared
+    os.makedirs(app.instance_path, exist_ok=True)
+    return 'sqlite:///' + os.path.join(app.instance_path, 'tracking_cache.db')
+
+# Public order tracking results, keyed by normalized phone number
+tracking_cache = create_cache(TRACKING_CACHE_BACKEND or _default_tracking_backend())
+
+def tracking_cache_key(normalized_phone):
+    return f"track:{normalized_phone}"
+
+def invalidate_tracking(normalized_phone):
+    """Drop cached tracking results for a phone number after its orders change"""
+    if normalized_phone:
+        tracking_cache.delete(tracking_cache_key(normalized_phone))
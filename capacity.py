@@ -0,0 +1,163 @@
+"""
+Delivery-date capacity planning.
+Booked cargo is kept in one bucket row per (delivery_date, delivery_type),
+adjusted in the same transaction as the request, so checking a day is a
+primary-key lookup and the calendar reads N rows instead of aggregating
+requests.
+"""
+
+from collections import namedtuple
+from datetime import date, timedelta
+
+import click
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from models import DeliveryCapacityBucket, Request
+from config import CAPACITY_LIMITS, CAPACITY_MODE, CAPACITY_WARN_RATIO
+
+DELIVERY_TYPES = ['astana', 'regions']
+
+# Outcome of booking cargo on a day: load is after the booking when accepted
+Booking = namedtuple('Booking', ['accepted', 'weight_kg', 'volume_m3', 'weight_limit', 'volume_limit'])
+
+def load_ratio(weight_kg, volume_m3, weight_limit, volume_limit):
+    """Highest share of a day's weight or volume limit in use, None without limits"""
+    ratios = [used / limit for used, limit in ((weight_kg, weight_limit), (volume_m3, volume_limit)) if limit]
+    return max(ratios) if ratios else None
+
+def _bucket_filter(delivery_date, delivery_type):
+    return DeliveryCapacityBucket.query.filter_by(delivery_date=delivery_date, delivery_type=delivery_type)
+
+def _increment(weight, volume, count):
+    return {
+        DeliveryCapacityBucket.request_count: DeliveryCapacityBucket.request_count + count,
+        DeliveryCapacityBucket.weight_kg: DeliveryCapacityBucket.weight_kg + weight,
+        DeliveryCapacityBucket.volume_m3: DeliveryCapacityBucket.volume_m3 + volume,
+    }
+
+def adjust_capacity(delivery_date, delivery_type, weight, volume, count=1):
+    """Add cargo to a day's bucket without checking limits (caller commits)"""
+    if delivery_date is None:
+        return
+    weight, volume = weight or 0.0, volume or 0.0
+    if _bucket_filter(delivery_date, delivery_type).update(_increment(weight, volume, count),
+                                                           synchronize_session=False):
+        return
+    try:
+        # First booking for this day, another worker may race us
+        with db.session.begin_nested():
+            db.session.add(DeliveryCapacityBucket(delivery_date=delivery_date, delivery_type=delivery_type,
+                                                  request_count=count, weight_kg=weight, volume_m3=volume))
+    except IntegrityError:
+        _bucket_filter(delivery_date, delivery_type).update(_increment(weight, volume, count),
+                                                            synchronize_session=False)
+
+def book_capacity(delivery_date, delivery_type, weight, volume, enforce=None):
+    """
+    Book a new request's cargo on its delivery day (caller commits)
+
+    With enforcement the limit check and the increment are one guarded
+    UPDATE, so concurrent submissions cannot overbook a day between them.
+
+    Args:
+        delivery_date: Preferred delivery date
+        delivery_type: 'astana' or 'regions'
+        weight: Cargo weight in kg, may be None
+        volume: Cargo volume in m³, may be None
+        enforce: Refuse bookings over the limit, defaults to CAPACITY_MODE == 'reject'
+
+    Returns:
+        Booking
+    """
+    if enforce is None:
+        enforce = CAPACITY_MODE == 'reject'
+    limits = CAPACITY_LIMITS.get(delivery_type, {})
+    weight_limit, volume_limit = limits.get('weight_kg') or 0, limits.get('volume_m3') or 0
+    weight, volume = weight or 0.0, volume or 0.0
+
+    query = _bucket_filter(delivery_date, delivery_type)
+    if enforce and weight_limit:
+        query = query.filter(DeliveryCapacityBucket.weight_kg + weight <= weight_limit)
+    if enforce and volume_limit:
+        query = query.filter(DeliveryCapacityBucket.volume_m3 + volume <= volume_limit)
+    accepted = bool(query.update(_increment(weight, volume, 1), synchronize_session=False))
+
+    fits = not enforce or ((not weight_limit or weight <= weight_limit) and
+                           (not volume_limit or volume <= volume_limit))
+    if not accepted and fits:
+        try:
+            # No bucket yet: this is the first booking of the day
+            with db.session.begin_nested():
+                db.session.add(DeliveryCapacityBucket(delivery_date=delivery_date, delivery_type=delivery_type,
+                                                      request_count=1, weight_kg=weight, volume_m3=volume))
+            accepted = True
+        except IntegrityError:
+            # The bucket is full or another worker just created it: the guarded UPDATE decides
+            accepted = bool(query.update(_increment(weight, volume, 1), synchronize_session=False))
+
+    bucket = db.session.query(DeliveryCapacityBucket.weight_kg, DeliveryCapacityBucket.volume_m3) \
+        .filter_by(delivery_date=delivery_date, delivery_type=delivery_type).first()
+    booked_weight, booked_volume = bucket if bucket else (0.0, 0.0)
+    if not accepted:
+        # Report what the day would carry with this request
+        booked_weight, booked_volume = booked_weight + weight, booked_volume + volume
+    return Booking(accepted, booked_weight, booked_volume, weight_limit, volume_limit)
+
+def booking_warning(booking):
+    """True when an accepted booking leaves its day at or over CAPACITY_WARN_RATIO"""
+    ratio = load_ratio(booking.weight_kg, booking.volume_m3, booking.weight_limit, booking.volume_limit)
+    return ratio is not None and ratio >= CAPACITY_WARN_RATIO
+
+def capacity_calendar(days, start=None):
+    """
+    Booked load per day and delivery type for the next `days` days
+
+    Returns:
+        list of dicts: {'date', 'types': {delivery_type: {'requests', 'weight_kg', 'volume_m3',
+        'weight_limit', 'volume_limit', 'ratio'}}}
+    """
+    start = start or date.today()
+    end = start + timedelta(days=days - 1)
+    buckets = {(row.delivery_date, row.delivery_type): row for row in DeliveryCapacityBucket.query.filter(
+        DeliveryCapacityBucket.delivery_date.between(start, end))}
+
+    calendar = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        types = {}
+        for delivery_type in DELIVERY_TYPES:
+            row = buckets.get((day, delivery_type))
+            limits = CAPACITY_LIMITS.get(delivery_type, {})
+            weight_kg, volume_m3 = (row.weight_kg, row.volume_m3) if row else (0.0, 0.0)
+            types[delivery_type] = {
+                'requests': row.request_count if row else 0,
+                'weight_kg': weight_kg,
+                'volume_m3': volume_m3,
+                'weight_limit': limits.get('weight_kg') or None,
+                'volume_limit': limits.get('volume_m3') or None,
+                'ratio': load_ratio(weight_kg, volume_m3, limits.get('weight_kg'), limits.get('volume_m3')),
+            }
+        calendar.append({'date': day, 'types': types})
+    return calendar
+
+def rebuild_capacity():
+    """Recompute all buckets from the requests table with one GROUP BY"""
+    DeliveryCapacityBucket.query.delete(synchronize_session=False)
+    rows = db.session.query(
+        Request.preferred_delivery_date, Request.delivery_type, func.count(Request.id),
+        func.coalesce(func.sum(Request.cargo_weight), 0.0), func.coalesce(func.sum(Request.cargo_volume), 0.0),
+    ).filter(Request.preferred_delivery_date.isnot(None)) \
+        .group_by(Request.preferred_delivery_date, Request.delivery_type).all()
+    db.session.add_all(DeliveryCapacityBucket(delivery_date=day, delivery_type=delivery_type, request_count=count,
+                                              weight_kg=weight, volume_m3=volume)
+                       for day, delivery_type, count, weight, volume in rows)
+    db.session.commit()
+    return len(rows)
+
+@app.cli.command('rebuild-capacity')
+def rebuild_capacity_command():
+    """Recompute delivery capacity buckets from the requests table"""
+    rows = rebuild_capacity()
+    click.echo(f"Rebuilt {rows} delivery capacity buckets")
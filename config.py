@@ -1,5 +1,5 @@
 """
-Configuration file for Telegram notifications
+Configuration file for Telegram notifications and application tuning
 Add your bot token and chat ID here
 """
 
@@ -8,6 +8,121 @@ import os
 # Telegram Bot Configuration
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
 TELEGRAM_CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID', 'YOUR_CHAT_ID_HERE')
+# Point at a local stub server for testing
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_TIMEOUT = float(os.environ.get('TELEGRAM_TIMEOUT', '10'))
+TELEGRAM_POOL_SIZE = int(os.environ.get('TELEGRAM_POOL_SIZE', '4'))
+# Coalesce notifications queued within this many seconds into one digest (0 disables)
+TELEGRAM_BATCH_WINDOW = float(os.environ.get('TELEGRAM_BATCH_WINDOW', '0'))
+
+# Notification outbox delivery
+# 'thread' drains the outbox from a background thread in every web worker,
+# 'external' leaves it to `flask --app main notifications-worker`
+NOTIFICATION_WORKER_MODE = os.environ.get('NOTIFICATION_WORKER_MODE', 'thread')
+NOTIFICATION_POLL_INTERVAL = float(os.environ.get('NOTIFICATION_POLL_INTERVAL', '5'))
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', '20'))
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', '8'))
+NOTIFICATION_RETRY_BASE_SECONDS = float(os.environ.get('NOTIFICATION_RETRY_BASE_SECONDS', '10'))
+NOTIFICATION_RETRY_MAX_SECONDS = float(os.environ.get('NOTIFICATION_RETRY_MAX_SECONDS', '3600'))
+# How long a claimed notification stays invisible to other workers
+NOTIFICATION_LEASE_SECONDS = float(os.environ.get('NOTIFICATION_LEASE_SECONDS', '60'))
+
+# Pagination of dashboard and tracking results
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '200'))
+
+# Public order tracking cache: 'sqlite:///path' (shared by all workers) or 'memory' (per worker,
+# single-process development only); defaults to <instance>/tracking_cache.db
+TRACKING_CACHE_BACKEND = os.environ.get('TRACKING_CACHE_BACKEND')
+TRACKING_CACHE_TTL = float(os.environ.get('TRACKING_CACHE_TTL', '30'))
+TRACKING_CACHE_MAX_ENTRIES = int(os.environ.get('TRACKING_CACHE_MAX_ENTRIES', '1024'))
+
+# Live dashboard events (Server-Sent Events)
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', '1'))
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', '15'))
+EVENTS_RETENTION_HOURS = float(os.environ.get('EVENTS_RETENTION_HOURS', '24'))
+# Streams are served by events_main:app; set to 1 only when main:app itself runs
+# on thread workers (gunicorn --worker-class gthread), never on sync workers
+EVENTS_IN_APP = os.environ.get('EVENTS_IN_APP', '0') == '1'
+
+# Logging and metrics
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG').upper()
+# Shared by all workers of one deployment; defaults to <instance>/metrics
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+# If set, /metrics requires "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200'))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '10'))
+
+# Bulk status transitions
+BULK_STATUS_MAX_IDS = int(os.environ.get('BULK_STATUS_MAX_IDS', '500'))
+
+# Time-in-status rollups skip history rows younger than this, covering slow commits
+STATUS_ROLLUP_LAG_SECONDS = float(os.environ.get('STATUS_ROLLUP_LAG_SECONDS', '30'))
+
+# Delivery capacity per day and delivery type, 0 disables a limit
+CAPACITY_LIMITS = {
+    'astana': {
+        'weight_kg': float(os.environ.get('CAPACITY_ASTANA_WEIGHT_KG', '20000')),
+        'volume_m3': float(os.environ.get('CAPACITY_ASTANA_VOLUME_M3', '80')),
+    },
+    'regions': {
+        'weight_kg': float(os.environ.get('CAPACITY_REGIONS_WEIGHT_KG', '40000')),
+        'volume_m3': float(os.environ.get('CAPACITY_REGIONS_VOLUME_M3', '160')),
+    },
+}
+# 'warn' accepts overbooked days with a warning, 'reject' refuses the request
+CAPACITY_MODE = os.environ.get('CAPACITY_MODE', 'warn')
+CAPACITY_WARN_RATIO = float(os.environ.get('CAPACITY_WARN_RATIO', '0.9'))
+CAPACITY_CALENDAR_DAYS = int(os.environ.get('CAPACITY_CALENDAR_DAYS', '14'))
+
+# Route planning for same-day Astana deliveries
+ROUTE_VEHICLE_WEIGHT_KG = float(os.environ.get('ROUTE_VEHICLE_WEIGHT_KG', '1500'))
+ROUTE_VEHICLE_VOLUME_M3 = float(os.environ.get('ROUTE_VEHICLE_VOLUME_M3', '12'))
+ROUTE_MAX_STOPS = int(os.environ.get('ROUTE_MAX_STOPS', '25'))
+ROUTE_PLANNER_PROCESSES = int(os.environ.get('ROUTE_PLANNER_PROCESSES', '2'))
+# Plans still running after this many seconds are reported as failed
+ROUTE_PLAN_TIMEOUT = float(os.environ.get('ROUTE_PLAN_TIMEOUT', '300'))
+# District list and distance matrix, defaults to data/astana_districts.json
+ROUTE_DISTRICTS_FILE = os.environ.get('ROUTE_DISTRICTS_FILE')
+
+# Public request submission guards: 'sqlite:///path' (shared by all workers) or 'memory' (per worker,
+# single-process development only); defaults to <instance>/submit_guard.db
+SUBMIT_GUARD_BACKEND = os.environ.get('SUBMIT_GUARD_BACKEND')
+# Token buckets: burst size and refill rate in submissions per minute, 0 disables a limit
+SUBMIT_IP_BURST = float(os.environ.get('SUBMIT_IP_BURST', '10'))
+SUBMIT_IP_PER_MINUTE = float(os.environ.get('SUBMIT_IP_PER_MINUTE', '2'))
+SUBMIT_PHONE_BURST = float(os.environ.get('SUBMIT_PHONE_BURST', '3'))
+SUBMIT_PHONE_PER_MINUTE = float(os.environ.get('SUBMIT_PHONE_PER_MINUTE', '0.2'))
+# Identical submissions within this many seconds are collapsed into the first one
+SUBMIT_DEDUP_WINDOW = float(os.environ.get('SUBMIT_DEDUP_WINDOW', '600'))
+
+# Rendered public pages reused across anonymous visitors (CSRF token and flashes filled in per request)
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '1') == '1'
+PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', '3600'))
+# Part of every cache key; set per release (e.g. the git revision), defaults to a hash of templates and built assets
+PAGE_CACHE_VERSION = os.environ.get('PAGE_CACHE_VERSION')
+
+# Archival of delivered requests (flask --app main archive-requests)
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '500'))
+# Pause between batches so archiving never starves the web workers
+ARCHIVE_BATCH_PAUSE = float(os.environ.get('ARCHIVE_BATCH_PAUSE', '0.1'))
+
+# Database connections, per worker process
+# Optional read replica for read-only routes (see db_routing.py), e.g. a PostgreSQL standby
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+# After a request writes, the same client reads from the primary for this many seconds
+READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', '5'))
+# Pool sizing (ignored for SQLite): at least the number of gunicorn threads per worker
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '300'))
+# 'always' pings on every checkout, 'idle' only connections idle for DB_PRE_PING_IDLE_SECONDS, 'off' never
+DB_PRE_PING = os.environ.get('DB_PRE_PING', 'idle')
+DB_PRE_PING_IDLE_SECONDS = float(os.environ.get('DB_PRE_PING_IDLE_SECONDS', '30'))
 
 # Validate configuration
 def validate_telegram_config():
@@ -0,0 +1,162 @@
+"""
+Read/write routing between the primary database and an optional replica.
+
+Requests to the read-only endpoints in REPLICA_ENDPOINTS run their SELECTs
+on the DATABASE_REPLICA_URL engine; everything else, every write, flush,
+SELECT ... FOR UPDATE, and all work outside a request (CLI, workers) uses
+the primary. A request that wrote pins its client to the primary for
+READ_YOUR_WRITES_SECONDS, so a customer who just submitted an order or an
+employee who just changed a status never reads a lagging replica.
+
+Engine options (pool size, overflow, recycle, pre-ping) come from config
+and apply per worker process.
+"""
+
+import time
+from contextlib import contextmanager
+
+import click
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.sql import Executable, Select
+
+from config import (
+    DATABASE_REPLICA_URL,
+    READ_YOUR_WRITES_SECONDS,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_PRE_PING,
+    DB_PRE_PING_IDLE_SECONDS,
+)
+
+REPLICA_BIND = 'replica'
+# Session key holding the time until which the client reads from the primary
+PRIMARY_UNTIL_KEY = 'db_primary_until'
+
+# Endpoints that only read; writes they might issue still go to the primary
+REPLICA_ENDPOINTS = {
+    'dashboard',
+    'dashboard_stats',
+    'dashboard_requests_json',
+    'search',
+    'export_requests_download',
+    'track_order',
+    'track_order_json',
+    'capacity_view',
+}
+
+def engine_options(url):
+    """SQLAlchemy engine options of one worker for a database URL"""
+    options = {
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_PRE_PING == 'always',
+    }
+    if not url.startswith('sqlite'):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def _reads_replica():
+    return has_request_context() and g.get('db_read_replica', False)
+
+def _is_read(clause):
+    """Plain SELECTs, and textual statements marked execution_options(read_only=True)"""
+    if isinstance(clause, Select):
+        return clause._for_update_arg is None
+    return isinstance(clause, Executable) and clause.get_execution_options().get('read_only', False)
+
+@contextmanager
+def read_primary():
+    """Send the reads inside the block to the primary, e.g. when their result is cached"""
+    if not has_request_context():
+        yield
+        return
+    previous = g.get('db_read_replica', False)
+    g.db_read_replica = False
+    try:
+        yield
+    finally:
+        g.db_read_replica = previous
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends plain reads of replica endpoints to the replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _is_read(clause):
+            if _reads_replica():
+                return self._db.engines[REPLICA_BIND]
+        elif has_request_context():
+            # Anything but a read counts as a write for read-your-writes
+            g.db_wrote = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _ping_idle_connections(engine):
+    """Ping a pooled connection on checkout only when it sat idle, instead of on every checkout"""
+
+    @event.listens_for(engine, 'checkin')
+    def checkin(dbapi_connection, connection_record):
+        connection_record.info['checked_in_at'] = time.monotonic()
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get('checked_in_at')
+        if checked_in_at is None or time.monotonic() - checked_in_at < DB_PRE_PING_IDLE_SECONDS:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        except Exception as e:
+            # The pool discards this connection and checks out another one
+            raise DisconnectionError(f'Idle connection is gone: {e}') from e
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+def init_routing(app, db):
+    """Configure engines and register the per-request routing hooks on an app"""
+    url = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    if DATABASE_REPLICA_URL:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = {
+            'url': DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL),
+        }
+    db.init_app(app)
+
+    if DB_PRE_PING == 'idle':
+        with app.app_context():
+            for engine in db.engines.values():
+                _ping_idle_connections(engine)
+
+    @app.before_request
+    def choose_database():
+        g.db_read_replica = (
+            bool(DATABASE_REPLICA_URL)
+            and request.endpoint in REPLICA_ENDPOINTS
+            and session.get(PRIMARY_UNTIL_KEY, 0) < time.time()
+        )
+
+    @app.after_request
+    def remember_write(response):
+        if g.get('db_wrote') and READ_YOUR_WRITES_SECONDS > 0:
+            session[PRIMARY_UNTIL_KEY] = time.time() + READ_YOUR_WRITES_SECONDS
+        return response
+
+    @app.cli.command('replica-status')
+    def replica_status_command():
+        """Round trip and newest request id on the primary and the replica"""
+        from models import Request
+        for name, key in (('primary', None), ('replica', REPLICA_BIND)):
+            if key is not None and key not in db.engines:
+                click.echo(f"{name}: not configured (set DATABASE_REPLICA_URL)")
+                continue
+            engine = db.engines[key]
+            started = time.perf_counter()
+            with engine.connect() as connection:
+                newest = connection.execute(select(func.max(Request.id))).scalar()
+            click.echo(f"{name}: {engine.url.render_as_string(hide_password=True)}, newest request #{newest}, "
+                       f"{(time.perf_counter() - started) * 1000:.1f} ms")
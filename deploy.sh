@@ -118,7 +118,7 @@ EOF
 # Инициализация базы данных
 print_status "Инициализация базы данных..."
 cd $DEPLOY_DIR
-sudo -u hromkz bash -c 'source venv/bin/activate && source .env && python -c "from app import app, db; app.app_context().push(); db.create_all()"'
+sudo -u hromkz bash -c 'source venv/bin/activate && source .env && set -a && source .env && set +a && flask --app main upgrade-db && flask --app main build-assets --clean'
 
 # Настройка systemd службы
 print_status "Настройка systemd службы..."
@@ -133,6 +133,8 @@ Group=www-data
 WorkingDirectory=$DEPLOY_DIR
 Environment="PATH=$DEPLOY_DIR/venv/bin"
 EnvironmentFile=$DEPLOY_DIR/.env
+ExecStartPre=$DEPLOY_DIR/venv/bin/flask --app main upgrade-db
+ExecStartPre=$DEPLOY_DIR/venv/bin/flask --app main build-assets
 ExecStart=$DEPLOY_DIR/venv/bin/gunicorn --workers 3 --bind unix:$DEPLOY_DIR/hromkz.sock -m 007 main:app
 ExecReload=/bin/kill -s HUP \$MAINPID
 Restart=always
@@ -141,6 +143,27 @@ Restart=always
 WantedBy=multi-user.target
 EOF
 
+# Живые события панели (/events): долгие соединения обслуживает отдельный процесс на потоках,
+# чтобы они не занимали sync-воркеры main:app
+sudo tee /etc/systemd/system/hromkz-events.service > /dev/null << EOF
+[Unit]
+Description=Gunicorn instance to serve Hrom KZ Logistics live events
+After=network.target hromkz.service
+
+[Service]
+User=hromkz
+Group=www-data
+WorkingDirectory=$DEPLOY_DIR
+Environment="PATH=$DEPLOY_DIR/venv/bin"
+EnvironmentFile=$DEPLOY_DIR/.env
+ExecStart=$DEPLOY_DIR/venv/bin/gunicorn --worker-class gthread --workers 1 --threads 64 --timeout 0 --bind unix:$DEPLOY_DIR/hromkz-events.sock -m 007 events_main:app
+ExecReload=/bin/kill -s HUP \$MAINPID
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 # Настройка Nginx
 print_status "Настройка Nginx..."
 sudo tee /etc/nginx/sites-available/logistics.xrom.org > /dev/null << EOF
@@ -150,10 +173,33 @@ server {
 
     location = /favicon.ico { access_log off; log_not_found off; }
     
+    # Fingerprinted build (flask --app main build-assets): the URL changes with the content
+    location /assets/ {
+        alias $DEPLOY_DIR/static/dist/;
+        gzip_static on;
+        add_header Vary Accept-Encoding;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+    # Unversioned files must be revalidated after a deploy
     location /static/ {
         alias $DEPLOY_DIR/static/;
-        expires 1y;
-        add_header Cache-Control "public, immutable";
+        add_header Cache-Control "public, no-cache";
+    }
+
+    # Server-Sent Events: separate thread-based process, no buffering, long reads
+    location /events {
+        include proxy_params;
+        proxy_pass http://unix:$DEPLOY_DIR/hromkz-events.sock;
+        proxy_http_version 1.1;
+        proxy_set_header Connection "";
+        proxy_buffering off;
+        proxy_cache off;
+        proxy_read_timeout 1h;
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto \$scheme;
     }
 
     location / {
@@ -182,8 +228,8 @@ sudo chmod -R 755 $DEPLOY_DIR
 # Запуск служб
 print_status "Запуск служб..."
 sudo systemctl daemon-reload
-sudo systemctl start hromkz
-sudo systemctl enable hromkz
+sudo systemctl start hromkz hromkz-events
+sudo systemctl enable hromkz hromkz-events
 sudo systemctl restart nginx
 
 # Настройка файрвола
@@ -229,7 +275,7 @@ if [ -f "requirements_prod.txt" ]; then
 fi
 
 echo "Restarting application..."
-sudo systemctl restart hromkz
+sudo systemctl restart hromkz hromkz-events
 
 echo "Application updated successfully!"
 EOF
@@ -246,6 +292,7 @@ EOF
 # Проверка статуса служб
 print_status "Проверка статуса служб..."
 systemctl is-active --quiet hromkz && echo "✅ hromkz service: running" || echo "❌ hromkz service: stopped"
+systemctl is-active --quiet hromkz-events && echo "✅ hromkz-events service: running" || echo "❌ hromkz-events service: stopped"
 systemctl is-active --quiet nginx && echo "✅ nginx service: running" || echo "❌ nginx service: stopped"
 systemctl is-active --quiet postgresql && echo "✅ postgresql service: running" || echo "❌ postgresql service: stopped"
 
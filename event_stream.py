@@ -0,0 +1,201 @@
+"""
+Live request events for the employee dashboard over Server-Sent Events.
+
+Events are written to the request_event table in the same transaction as the
+change, so any web worker can publish them. Each process that serves streams
+runs one poller thread that reads new events and fans them out to its open
+connections. Long-lived streams belong on thread or async workers, see
+events_main.py: other processes answer /events with 204 unless
+SERVE_EVENT_STREAM (EVENTS_IN_APP) is set.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import Response, jsonify, render_template, request, session, stream_with_context
+
+from app import app, db
+from models import Request, RequestEvent
+from config import EVENTS_POLL_INTERVAL, EVENTS_HEARTBEAT, EVENTS_RETENTION_HOURS, EVENTS_IN_APP
+
+logger = logging.getLogger(__name__)
+
+REPLAY_LIMIT = 500
+RECONNECT_DELAY_MS = 3000
+# Ids are assigned at insert but become visible at commit, so concurrent
+# transactions can commit out of order; re-read this many ids each poll
+POLL_OVERLAP = 50
+PRUNE_INTERVAL = 600
+
+def publish_request_event(request_obj, event_type, old_status=None):
+    """Add an event for a request to the current session (caller commits)"""
+    event = RequestEvent()
+    event.request_id = request_obj.id
+    event.employee_id = request_obj.employee_id
+    event.event_type = event_type
+    event.old_status = old_status
+    event.new_status = request_obj.status
+    db.session.add(event)
+    return event
+
+class EventBroker:
+    """Polls the event table once per process and fans events out to subscribers"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._recent = deque(maxlen=1000)
+        self.last_id = 0
+
+    def subscribe(self, employee_id):
+        subscription = (employee_id, queue.Queue(maxsize=1000))
+        self.start()
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def notify(self):
+        """Poll right away instead of waiting for the next interval"""
+        self._wake.set()
+
+    def start(self):
+        """Start the poller thread once per process (gunicorn forks workers)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            with app.app_context():
+                self.last_id = db.session.query(db.func.max(RequestEvent.id)).scalar() or 0
+            thread = threading.Thread(target=self._run, name='event-broker', daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        last_prune = 0
+        while True:
+            self._wake.wait(EVENTS_POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                with app.app_context():
+                    self._poll()
+                    if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                        prune_events()
+                        last_prune = time.monotonic()
+            except Exception as e:
+                logger.error(f"Event broker error: {str(e)}")
+
+    def _poll(self):
+        events = RequestEvent.query.filter(RequestEvent.id > self.last_id - POLL_OVERLAP) \
+            .order_by(RequestEvent.id).limit(REPLAY_LIMIT + POLL_OVERLAP).all()
+        recent = set(self._recent)
+        events = [event for event in events if event.id not in recent]
+        if not events:
+            return
+        self._recent.extend(event.id for event in events)
+        self.last_id = max(self.last_id, events[-1].id)
+        payloads = [_event_payload(event) for event in events]
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for employee_id, inbox in subscribers:
+            for event, payload in zip(events, payloads):
+                if event.employee_id == employee_id:
+                    try:
+                        inbox.put_nowait(payload)
+                    except queue.Full:
+                        # A stalled client; it will resync with Last-Event-ID on reconnect
+                        pass
+
+broker = EventBroker()
+
+def _event_payload(event):
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'request_id': event.request_id,
+        'old_status': event.old_status,
+        'new_status': event.new_status,
+    }
+
+def prune_events(retention_hours=EVENTS_RETENTION_HOURS):
+    """Delete events older than the retention window"""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    deleted = RequestEvent.query.filter(RequestEvent.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def _format_events(payloads):
+    """Render SSE frames, attaching the current table row markup of each request"""
+    rows = {row.id: row for row in Request.query.filter(
+        Request.id.in_({payload['request_id'] for payload in payloads})).all()}
+    frames = []
+    for payload in payloads:
+        row = rows.get(payload['request_id'])
+        data = dict(payload, html=render_template('dashboard_rows.html', requests=[row]) if row else None)
+        frames.append(f"id: {payload['id']}\nevent: {payload['type']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n")
+    # Do not keep a connection checked out while the stream idles
+    db.session.rollback()
+    return ''.join(frames)
+
+@app.route('/events')
+def request_events():
+    """Server-Sent Events stream of the employee's request changes"""
+    if not app.config.get('SERVE_EVENT_STREAM', EVENTS_IN_APP):
+        # A stream would hold a sync worker for as long as the tab is open;
+        # 204 tells EventSource not to reconnect
+        return '', 204
+    if 'employee_id' not in session:
+        return jsonify(error='Доступ запрещен.'), 401
+
+    employee_id = session['employee_id']
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    def generate():
+        broker.start()
+        seen_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else broker.last_id
+        subscription = broker.subscribe(employee_id)
+        _, inbox = subscription
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+
+            # Events the broker picked up before we subscribed, or missed since a reconnect
+            missed = RequestEvent.query.filter(
+                RequestEvent.employee_id == employee_id,
+                RequestEvent.id > seen_id,
+                RequestEvent.id <= broker.last_id,
+            ).order_by(RequestEvent.id).limit(REPLAY_LIMIT).all()
+            sent_ids = deque((event.id for event in missed), maxlen=1000)
+            if missed:
+                yield _format_events([_event_payload(event) for event in missed])
+            else:
+                db.session.rollback()
+
+            while True:
+                try:
+                    payloads = [inbox.get(timeout=EVENTS_HEARTBEAT)]
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                while not inbox.empty():
+                    payloads.append(inbox.get_nowait())
+                payloads = [payload for payload in payloads if payload['id'] not in sent_ids]
+                if payloads:
+                    sent_ids.extend(payload['id'] for payload in payloads)
+                    yield _format_events(payloads)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
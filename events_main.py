@@ -0,0 +1,26 @@
+"""
+Entry point for the dedicated live events process.
+
+Event streams stay open for as long as the dashboard is, so they must not be
+served by the sync workers of main:app. Run this app on thread workers and
+route /events to it in nginx:
+
+    gunicorn --worker-class gthread --workers 1 --threads 64 --bind 127.0.0.1:5001 events_main:app
+
+main:app answers /events with 204 so its sync workers are never held.
+"""
+
+from flask import abort, request
+
+from app import app
+
+app.config['SERVE_EVENT_STREAM'] = True
+
+# Serve only the event stream from this process
+ALLOWED_ENDPOINTS = {'request_events', 'static'}
+
+@app.before_request
+def _only_event_stream():
+    """Reject everything except the event stream"""
+    if request.endpoint not in ALLOWED_ENDPOINTS:
+        abort(404)
@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import StringField, TextAreaField, SelectField, FloatField, DateField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Email, Length, Optional, ValidationError
 from models import Employee
@@ -46,3 +47,17 @@ class RequestForm(FlaskForm):
 class TrackingForm(FlaskForm):
     customer_phone = StringField('Номер телефона клиента', validators=[DataRequired(), Length(max=20)])
     submit = SubmitField('Отследить заказы')
+
+class ImportForm(FlaskForm):
+    file = FileField('Файл CSV или JSONL', validators=[FileRequired(), FileAllowed(['csv', 'jsonl', 'ndjson'])])
+    submit = SubmitField('Импортировать')
+
+class BulkStatusForm(FlaskForm):
+    status = SelectField('Новый статус',
+                         choices=[('processing', 'В обработке'), ('shipped', 'Отправлено'), ('delivered', 'Доставлено')],
+                         validators=[DataRequired()])
+    submit = SubmitField('Применить к выбранным')
+
+class RoutePlanForm(FlaskForm):
+    delivery_date = DateField('Дата доставки', validators=[DataRequired()])
+    submit = SubmitField('Спланировать маршруты')
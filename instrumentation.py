@@ -0,0 +1,89 @@
+"""
+Request timing, SQL query accounting and the Prometheus /metrics endpoint
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+from metrics import COUNT_BUCKETS, MultiprocessStore, registry, render_prometheus
+from config import (
+    METRICS_DIR,
+    METRICS_FLUSH_INTERVAL,
+    METRICS_TOKEN,
+    SLOW_QUERY_THRESHOLD_MS,
+    N_PLUS_ONE_THRESHOLD,
+)
+
+logger = logging.getLogger(__name__)
+
+store = MultiprocessStore(METRICS_DIR or os.path.join(app.instance_path, 'metrics'), METRICS_FLUSH_INTERVAL)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    registry.inc('db_queries_total')
+    registry.observe('db_query_duration_seconds', elapsed)
+
+    if elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        registry.inc('db_slow_queries_total')
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms): {statement[:500]}")
+
+    if has_request_context() and 'query_statements' in g:
+        g.query_statements[statement] += 1
+        g.query_time += elapsed
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    # after_cursor_execute is skipped for failed statements
+    if context.connection is not None and context.connection.info.get('query_start_time'):
+        context.connection.info['query_start_time'].pop()
+
+@app.before_request
+def _start_request_timer():
+    """Start per-request timing and query accounting"""
+    g.request_start_time = time.perf_counter()
+    g.query_statements = Counter()
+    g.query_time = 0.0
+
+@app.after_request
+def _record_request_metrics(response):
+    """Record latency and query counts of the finished request"""
+    if 'request_start_time' not in g:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    elapsed = time.perf_counter() - g.request_start_time
+    queries = sum(g.query_statements.values())
+
+    registry.inc('http_requests_total', {'endpoint': endpoint, 'method': request.method,
+                                         'status': str(response.status_code)})
+    registry.observe('http_request_duration_seconds', elapsed, {'endpoint': endpoint, 'method': request.method})
+    registry.observe('db_queries_per_request', queries, {'endpoint': endpoint}, buckets=COUNT_BUCKETS)
+
+    if g.query_statements:
+        statement, repeats = g.query_statements.most_common(1)[0]
+        if repeats >= N_PLUS_ONE_THRESHOLD:
+            registry.inc('db_n_plus_one_total', {'endpoint': endpoint})
+            logger.warning(f"Possible N+1 in {endpoint}: statement ran {repeats} times: {statement[:300]}")
+
+    app.logger.debug(f"{request.method} {request.path} {response.status_code} "
+                     f"{elapsed * 1000:.1f} ms, {queries} queries ({g.query_time * 1000:.1f} ms)")
+    store.flush(registry)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus metrics aggregated across all workers"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        abort(401)
+    return Response(render_prometheus(store.collect(registry)), mimetype='text/plain; version=0.0.4')
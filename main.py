@@ -1,4 +1,12 @@
 from app import app
 
 if __name__ == '__main__':
+    # Development server: bring the local database and built assets up to date first
+    from migrations import upgrade
+    from assets import build_assets
+    with app.app_context():
+        upgrade()
+    build_assets()
+    # The threaded development server can hold event streams itself
+    app.config['SERVE_EVENT_STREAM'] = True
     app.run(host='0.0.0.0', port=5000, debug=True)
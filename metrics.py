@@ -0,0 +1,208 @@
+"""
+In-process metrics registry with Prometheus text rendering.
+
+Each gunicorn worker keeps its own counters and histograms and periodically
+writes a snapshot to METRICS_DIR; the /metrics endpoint merges the snapshots
+of all workers. Dead workers' snapshots are folded into an archive file so
+counters stay monotonic across restarts.
+"""
+
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+# Prometheus default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+HELP = {
+    'http_requests_total': 'HTTP requests by endpoint, method and status',
+    'http_request_duration_seconds': 'Time to produce the response (up to the first byte for streams)',
+    'db_queries_total': 'SQL statements executed',
+    'db_query_duration_seconds': 'SQL statement execution time',
+    'db_queries_per_request': 'SQL statements executed per HTTP request',
+    'db_slow_queries_total': 'SQL statements slower than SLOW_QUERY_THRESHOLD_MS',
+    'db_n_plus_one_total': 'Requests that repeated one statement N_PLUS_ONE_THRESHOLD times or more',
+    'telegram_api_requests_total': 'Telegram Bot API calls by method and outcome',
+    'telegram_api_duration_seconds': 'Telegram Bot API call latency',
+}
+
+def _key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms of one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels=None, value=1):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None, buckets=DEFAULT_BUCKETS):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+                self._histograms[key] = histogram
+            for i, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        """JSON-serializable copy of all metrics"""
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, dict(labels), dict(h, counts=list(h['counts']))]
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+def merge_snapshots(snapshots):
+    """Sum several snapshots into one"""
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get('counters', []):
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in snapshot.get('histograms', []):
+            key = _key(name, labels)
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = dict(h, counts=list(h['counts']))
+            elif merged['buckets'] == h['buckets']:
+                merged['counts'] = [a + b for a, b in zip(merged['counts'], h['counts'])]
+                merged['sum'] += h['sum']
+                merged['count'] += h['count']
+    return {
+        'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, dict(labels), h] for (name, labels), h in histograms.items()],
+    }
+
+def _format_labels(labels, extra=None):
+    items = sorted(labels.items()) + list(extra or [])
+    if not items:
+        return ''
+    escaped = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in items
+    )
+    return '{' + escaped + '}'
+
+def render_prometheus(snapshot):
+    """Render a snapshot in the Prometheus text exposition format"""
+    lines = []
+    described = set()
+
+    def describe(name, kind):
+        if name not in described:
+            described.add(name)
+            if name in HELP:
+                lines.append(f'# HELP {name} {HELP[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+    for name, labels, value in sorted(snapshot['counters'], key=lambda c: (c[0], sorted(c[1].items()))):
+        describe(name, 'counter')
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    for name, labels, h in sorted(snapshot['histograms'], key=lambda c: (c[0], sorted(c[1].items()))):
+        describe(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(h['buckets'], h['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {h["count"]}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {h["sum"]}')
+        lines.append(f'{name}_count{_format_labels(labels)} {h["count"]}')
+
+    return '\n'.join(lines) + '\n'
+
+class MultiprocessStore:
+    """Per-process snapshot files in a directory shared by all workers"""
+
+    ARCHIVE = 'metrics-archive.json'
+
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._last_flush = 0.0
+        # Request threads and the notification worker flush the same file
+        self._flush_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def _write(self, path, snapshot):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def flush(self, registry, force=False):
+        """Write this process's snapshot, at most once per flush interval unless forced"""
+        with self._flush_lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = now
+            self._write(self._path(os.getpid()), registry.snapshot())
+
+    def collect(self, registry):
+        """Merged snapshot of all workers, compacting files of processes that exited"""
+        self.flush(registry, force=True)
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(self.directory, self.ARCHIVE)
+            archive = self._read(archive_path) or {}
+            snapshots = [archive]
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                if path == archive_path:
+                    continue
+                pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+                snapshot = self._read(path)
+                if snapshot is None:
+                    continue
+                if _pid_alive(pid):
+                    snapshots.append(snapshot)
+                else:
+                    dead.append((path, snapshot))
+            if dead:
+                archive = merge_snapshots([archive] + [snapshot for _, snapshot in dead])
+                self._write(archive_path, archive)
+                for path, _ in dead:
+                    os.remove(path)
+                snapshots[0] = archive
+        return merge_snapshots(snapshots)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Process-wide registry used by all instrumented modules
+registry = MetricsRegistry()
@@ -0,0 +1,196 @@
+"""
+Versioned schema migrations.
+The application never touches the schema at startup; run
+`flask --app main upgrade-db` on deploy, before (re)starting the workers.
+Applied versions are recorded in schema_version, so an upgraded database
+costs one query per run. Every step is also idempotent, which lets
+databases that predate the version table replay the whole list safely.
+"""
+
+import logging
+from contextlib import contextmanager
+
+import click
+from sqlalchemy import inspect, text
+
+from app import app, db
+from models import (DeliveryCapacityBucket, EmployeeStatusCounter, Request, RequestArchive, RoutePlan, SchemaVersion,
+                    normalize_phone)
+from capacity import rebuild_capacity
+from search import ensure_search_index
+from status_counters import rebuild_status_counters
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+# Arbitrary key of the PostgreSQL advisory lock held while migrating
+MIGRATION_LOCK_ID = 720814
+
+def _add_column(inspector, table, column, ddl_type):
+    """Add a nullable column if the table does not have it yet"""
+    columns = {c['name'] for c in inspector.get_columns(table)}
+    if column in columns:
+        return False
+    db.session.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl_type}'))
+    db.session.commit()
+    logger.info(f"Added column {table}.{column}")
+    return True
+
+def _create_indexes(inspector, model):
+    """Create the model's declared indexes that are missing in the database"""
+    table = model.__table__
+    existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(bind=db.engine)
+            logger.info(f"Created index {index.name}")
+
+def backfill_normalized_phones(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Fill Request.customer_phone_normalized for rows written before the column existed.
+    Works in short batches so no long write lock is held.
+
+    Returns:
+        Number of updated rows
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Request.id, Request.customer_phone)
+            .where(Request.id > last_id, Request.customer_phone_normalized.is_(None))
+            .order_by(Request.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(
+            db.update(Request.__table__)
+            .where(Request.__table__.c.id == db.bindparam('row_id'))
+            .values(customer_phone_normalized=db.bindparam('normalized')),
+            [{'row_id': row.id, 'normalized': normalize_phone(row.customer_phone)} for row in rows],
+        )
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+    return updated
+
+def _seed_status_counters():
+    """Build status counters once for databases that predate them"""
+    has_counters = db.session.query(EmployeeStatusCounter.query.exists()).scalar()
+    has_assigned = db.session.query(Request.query.filter(Request.employee_id.isnot(None)).exists()).scalar()
+    if not has_counters and has_assigned:
+        rows = rebuild_status_counters()
+        logger.info(f"Seeded {rows} employee status counters")
+
+def _create_tables():
+    db.create_all()
+
+def _add_normalized_phones():
+    if _add_column(inspect(db.engine), 'request', 'customer_phone_normalized', 'VARCHAR(20)'):
+        updated = backfill_normalized_phones()
+        logger.info(f"Backfilled {updated} normalized phone numbers")
+
+def _add_status_changed_at():
+    if _add_column(inspect(db.engine), 'request', 'status_changed_at', 'TIMESTAMP'):
+        # Only a pending request is known to have entered its status at creation
+        db.session.execute(text("UPDATE request SET status_changed_at = created_at WHERE status = 'pending'"))
+        db.session.commit()
+
+def _create_request_indexes():
+    _create_indexes(inspect(db.engine), Request)
+
+def _create_capacity_buckets():
+    DeliveryCapacityBucket.__table__.create(bind=db.engine, checkfirst=True)
+    if not db.session.query(DeliveryCapacityBucket.query.exists()).scalar():
+        rows = rebuild_capacity()
+        logger.info(f"Seeded {rows} delivery capacity buckets")
+
+def _create_route_plans():
+    RoutePlan.__table__.create(bind=db.engine, checkfirst=True)
+
+def _create_request_archive():
+    RequestArchive.__table__.create(bind=db.engine, checkfirst=True)
+    # Status history keeps the ids of requests that move to the archive (SQLite does not enforce the key)
+    if db.engine.dialect.name == 'postgresql':
+        for foreign_key in inspect(db.engine).get_foreign_keys('request_status_history'):
+            if foreign_key['referred_table'] == 'request' and foreign_key['name']:
+                db.session.execute(text(
+                    f'ALTER TABLE request_status_history DROP CONSTRAINT "{foreign_key["name"]}"'))
+        db.session.commit()
+
+# Append new steps at the end, never renumber or edit applied ones
+MIGRATIONS = [
+    (1, 'Create tables', _create_tables),
+    (2, 'Normalized customer phone numbers', _add_normalized_phones),
+    (3, 'Request status change timestamps', _add_status_changed_at),
+    (4, 'Request lookup indexes', _create_request_indexes),
+    (5, 'Employee status counters', _seed_status_counters),
+    (6, 'Full-text search index', ensure_search_index),
+    (7, 'Delivery capacity buckets', _create_capacity_buckets),
+    (8, 'Route plans', _create_route_plans),
+    (9, 'Request archive', _create_request_archive),
+]
+
+@contextmanager
+def _migration_lock():
+    """Serialize concurrent upgrade runs on PostgreSQL (SQLite locks the file itself)"""
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as conn:
+        conn.execute(text('SELECT pg_advisory_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+        try:
+            yield
+        finally:
+            conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': MIGRATION_LOCK_ID})
+
+def current_version():
+    """Highest applied migration, 0 for a database without the version table"""
+    if not inspect(db.engine).has_table(SchemaVersion.__tablename__):
+        return 0
+    return db.session.query(db.func.max(SchemaVersion.version)).scalar() or 0
+
+def pending_migrations():
+    """Migrations newer than the database's version"""
+    version = current_version()
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+def upgrade():
+    """
+    Apply pending migrations in order (requires an app context)
+
+    Returns:
+        List of applied version numbers
+    """
+    applied = []
+    with _migration_lock():
+        SchemaVersion.__table__.create(bind=db.engine, checkfirst=True)
+        for version, description, step in pending_migrations():
+            logger.info(f"Applying migration {version}: {description}")
+            step()
+            db.session.add(SchemaVersion(version=version, description=description))
+            db.session.commit()
+            applied.append(version)
+    return applied
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Apply pending schema migrations"""
+    applied = upgrade()
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(map(str, applied))}")
+    click.echo(f"Database schema is at version {MIGRATIONS[-1][0]}")
+
+@app.cli.command('db-version')
+def db_version_command():
+    """Show the applied schema version and pending migrations"""
+    click.echo(f"Database schema version: {current_version()}")
+    for version, description, _ in pending_migrations():
+        click.echo(f"  pending {version}: {description}")
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Recompute employee status counters from the requests table"""
+    rows = rebuild_status_counters()
+    click.echo(f"Rebuilt {rows} employee status counters")
@@ -1,7 +1,23 @@
+import re
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 
+def normalize_phone(phone):
+    """
+    Reduce a Kazakhstan phone number to its canonical digits-only form,
+    so "+7 (777) 123-45-67" and "87771234567" both become "77771234567"
+    """
+    if not phone:
+        return phone
+    digits = re.sub(r'\D', '', phone)
+    if len(digits) == 11 and digits.startswith('8'):
+        digits = '7' + digits[1:]
+    elif len(digits) == 10:
+        digits = '7' + digits
+    return digits
+
 class Employee(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
@@ -23,11 +39,18 @@ class Employee(db.Model):
         return f'<Employee {self.username}>'
 
 class Request(db.Model):
+    __table_args__ = (
+        db.Index('ix_request_phone_normalized_created_at', 'customer_phone_normalized', 'created_at'),
+        db.Index('ix_request_employee_id_created_at', 'employee_id', 'created_at'),
+        db.Index('ix_request_status_created_at', 'status', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     
     # Customer information
     customer_name = db.Column(db.String(100), nullable=False)
     customer_phone = db.Column(db.String(20), nullable=False)
+    customer_phone_normalized = db.Column(db.String(20))  # kept in sync by set_customer_phone
     customer_address = db.Column(db.Text, nullable=False)
     
     # Shipment details
@@ -43,7 +66,195 @@ class Request(db.Model):
     # System fields
     status = db.Column(db.String(20), default='pending')  # pending, processing, shipped, delivered
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status_changed_at = db.Column(db.DateTime, default=datetime.utcnow)  # when the current status was entered
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=True)
     
+    @validates('customer_phone')
+    def set_customer_phone(self, key, phone):
+        self.customer_phone_normalized = normalize_phone(phone)
+        return phone
+    
+    def to_dict(self):
+        """Public representation used by the JSON endpoints"""
+        return {
+            'id': self.id,
+            'customer_name': self.customer_name,
+            'customer_phone': self.customer_phone,
+            'customer_address': self.customer_address,
+            'delivery_type': self.delivery_type,
+            'cargo_description': self.cargo_description,
+            'cargo_weight': self.cargo_weight,
+            'cargo_volume': self.cargo_volume,
+            'special_instructions': self.special_instructions,
+            'preferred_delivery_date': self.preferred_delivery_date.isoformat() if self.preferred_delivery_date else None,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'employee_id': self.employee_id,
+        }
+    
     def __repr__(self):
         return f'<Request {self.id} - {self.customer_name}>'
+
+class RequestArchive(db.Model):
+    """Delivered request moved out of the request table by archive.py, monthly partitions on PostgreSQL"""
+    __tablename__ = 'request_archive'
+    __table_args__ = (
+        db.Index('ix_request_archive_phone_normalized_created_at', 'customer_phone_normalized', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+    
+    # Ids are kept from the request table; the partition key has to be part of the primary key
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, primary_key=True)
+    
+    customer_name = db.Column(db.String(100), nullable=False)
+    customer_phone = db.Column(db.String(20), nullable=False)
+    customer_phone_normalized = db.Column(db.String(20))
+    customer_address = db.Column(db.Text, nullable=False)
+    delivery_type = db.Column(db.String(20), nullable=False)
+    cargo_description = db.Column(db.Text, nullable=False)
+    cargo_weight = db.Column(db.Float)
+    cargo_volume = db.Column(db.Float)
+    special_instructions = db.Column(db.Text)
+    preferred_delivery_date = db.Column(db.Date)
+    status = db.Column(db.String(20))
+    status_changed_at = db.Column(db.DateTime)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    to_dict = Request.to_dict
+    
+    def __repr__(self):
+        return f'<RequestArchive {self.id} - {self.customer_name}>'
+
+class NotificationOutbox(db.Model):
+    """Queued Telegram notification, written in the same transaction as its request"""
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('request.id'), nullable=True)
+    delivery_type = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON-encoded request_data
+
+    # Delivery state
+    status = db.Column(db.String(20), default='pending')  # pending, sent, dead
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.id} - {self.status}>'
+
+class EmployeeStatusCounter(db.Model):
+    """Number of an employee's requests per status, maintained on every write"""
+    __tablename__ = 'employee_status_counter'
+
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<EmployeeStatusCounter {self.employee_id} {self.status}={self.count}>'
+
+class DeliveryCapacityBucket(db.Model):
+    """Cargo booked for one delivery day and type, maintained on every request write"""
+    __tablename__ = 'delivery_capacity_bucket'
+
+    delivery_date = db.Column(db.Date, primary_key=True)
+    delivery_type = db.Column(db.String(20), primary_key=True)
+    request_count = db.Column(db.Integer, default=0, nullable=False)
+    weight_kg = db.Column(db.Float, default=0.0, nullable=False)
+    volume_m3 = db.Column(db.Float, default=0.0, nullable=False)
+
+    def __repr__(self):
+        return f'<DeliveryCapacityBucket {self.delivery_date} {self.delivery_type}: {self.weight_kg} kg>'
+
+class RequestEvent(db.Model):
+    """Request created/status-changed event, read by the live event stream"""
+    __tablename__ = 'request_event'
+    __table_args__ = (
+        db.Index('ix_request_event_employee_id_id', 'employee_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('request.id'), nullable=False)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=True)
+    event_type = db.Column(db.String(30), nullable=False)  # request_created, status_changed
+    old_status = db.Column(db.String(20))
+    new_status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<RequestEvent {self.id} {self.event_type} #{self.request_id}>'
+
+class RequestStatusHistory(db.Model):
+    """Append-only log of status transitions, written in the same transaction as the change"""
+    __tablename__ = 'request_status_history'
+    __table_args__ = (
+        db.Index('ix_request_status_history_request_id_id', 'request_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: the request may have moved to request_archive
+    request_id = db.Column(db.Integer, nullable=False)
+    delivery_type = db.Column(db.String(20), nullable=False)
+    from_status = db.Column(db.String(20), nullable=False)
+    to_status = db.Column(db.String(20), nullable=False)
+    changed_by = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=True)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Time spent in from_status, NULL when it was entered before the history existed
+    seconds_in_status = db.Column(db.Float)
+
+    def __repr__(self):
+        return f'<RequestStatusHistory #{self.request_id} {self.from_status}->{self.to_status}>'
+
+class StatusDurationBucket(db.Model):
+    """Histogram of time spent in a status per delivery type, built from the status history"""
+    __tablename__ = 'status_duration_bucket'
+
+    delivery_type = db.Column(db.String(20), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)  # index into status_history.DURATION_BUCKETS
+    count = db.Column(db.Integer, default=0, nullable=False)
+    total_seconds = db.Column(db.Float, default=0.0, nullable=False)
+
+class RollupState(db.Model):
+    """Last source row folded into a rollup, so refreshes only read new rows"""
+    __tablename__ = 'rollup_state'
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class RoutePlan(db.Model):
+    """Vehicle loads and stop order planned for one delivery day"""
+    __tablename__ = 'route_plan'
+
+    id = db.Column(db.Integer, primary_key=True)
+    delivery_date = db.Column(db.Date, nullable=False, index=True)
+    delivery_type = db.Column(db.String(20), nullable=False, default='astana')
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, done, failed
+    created_by = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    request_count = db.Column(db.Integer, default=0, nullable=False)
+    vehicle_count = db.Column(db.Integer)
+    total_km = db.Column(db.Float)
+    result = db.Column(db.Text)  # JSON from route_planner.plan_routes
+    error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<RoutePlan {self.id} {self.delivery_date} {self.status}>'
+
+class SchemaVersion(db.Model):
+    """Applied schema migrations, maintained by migrations.upgrade()"""
+    __tablename__ = 'schema_version'
+
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,227 @@
+"""
+Notification outbox: durable queue of Telegram notifications and its delivery worker
+"""
+
+import json
+import logging
+import os
+import signal
+import threading
+from datetime import datetime, timedelta
+
+import click
+
+from app import app, db
+from models import NotificationOutbox
+from metrics import registry
+from instrumentation import store as metrics_store
+from telegram_service import send_status_update_notification, send_telegram_digest
+from config import (
+    TELEGRAM_BATCH_WINDOW,
+    NOTIFICATION_WORKER_MODE,
+    NOTIFICATION_POLL_INTERVAL,
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_RETRY_BASE_SECONDS,
+    NOTIFICATION_RETRY_MAX_SECONDS,
+    NOTIFICATION_LEASE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Outbox delivery_type of aggregated status change notifications
+STATUS_UPDATE = 'status_update'
+
+_wake_event = threading.Event()
+_worker_lock = threading.Lock()
+_worker_pid = None
+
+def enqueue_notification(request_data, delivery_type, request_id=None):
+    """
+    Add a notification to the outbox using the current session.
+    The caller commits it together with the request it describes.
+
+    Args:
+        request_data: Dictionary containing request information
+        delivery_type: 'astana', 'regions' or STATUS_UPDATE
+        request_id: Id of the related Request, if any
+
+    Returns:
+        NotificationOutbox instance
+    """
+    entry = NotificationOutbox()
+    entry.request_id = request_id
+    entry.delivery_type = delivery_type
+    entry.payload = json.dumps(request_data, ensure_ascii=False, default=str)
+    entry.status = 'pending'
+    entry.attempts = 0
+    entry.next_attempt_at = datetime.utcnow()
+    db.session.add(entry)
+    return entry
+
+def retry_delay(attempts):
+    """Exponential backoff delay in seconds after the given number of failed attempts"""
+    delay = NOTIFICATION_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return min(delay, NOTIFICATION_RETRY_MAX_SECONDS)
+
+def _claim(entry_id, now):
+    """
+    Lease one due notification so that no other worker sends it concurrently.
+    If this worker dies mid-delivery the entry becomes due again after the lease.
+    """
+    claimed = NotificationOutbox.query.filter(
+        NotificationOutbox.id == entry_id,
+        NotificationOutbox.status == 'pending',
+        NotificationOutbox.next_attempt_at <= now,
+    ).update({
+        NotificationOutbox.next_attempt_at: now + timedelta(seconds=NOTIFICATION_LEASE_SECONDS),
+        NotificationOutbox.attempts: NotificationOutbox.attempts + 1,
+    }, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def _record_outcome(entry, success, message, now):
+    """Mark a claimed notification sent, schedule its retry or dead-letter it"""
+    if success:
+        entry.status = 'sent'
+        entry.sent_at = now
+        entry.last_error = None
+    elif entry.attempts >= NOTIFICATION_MAX_ATTEMPTS:
+        entry.status = 'dead'
+        entry.last_error = message
+        logger.error(f"Notification {entry.id} dead-lettered after {entry.attempts} attempts: {message}")
+    else:
+        entry.next_attempt_at = now + timedelta(seconds=retry_delay(entry.attempts))
+        entry.last_error = message
+        logger.warning(f"Notification {entry.id} attempt {entry.attempts} failed: {message}")
+
+def _deliver(entries):
+    """
+    Send claimed notifications and record the outcome.
+    With batching enabled all new requests go out as one digest; when one of its
+    messages fails, only the entries not yet delivered are retried. Status updates
+    are already aggregated and are always sent on their own.
+    """
+    updates = [entry for entry in entries if entry.delivery_type == STATUS_UPDATE]
+    new_requests = [entry for entry in entries if entry.delivery_type != STATUS_UPDATE]
+    if TELEGRAM_BATCH_WINDOW > 0 and new_requests:
+        groups = [new_requests]
+    else:
+        groups = [[entry] for entry in new_requests]
+    groups += [[entry] for entry in updates]
+
+    sent = failed = 0
+    for group in groups:
+        delivered = 0
+        try:
+            if group[0].delivery_type == STATUS_UPDATE:
+                success, message = send_status_update_notification(json.loads(group[0].payload))
+                delivered = len(group) if success else 0
+            else:
+                items = [(json.loads(entry.payload), entry.delivery_type) for entry in group]
+                success, message, delivered = send_telegram_digest(items)
+        except Exception as e:
+            success, message = False, f"Unexpected error: {str(e)}"
+
+        now = datetime.utcnow()
+        for index, entry in enumerate(group):
+            _record_outcome(entry, index < delivered, message, now)
+        db.session.commit()
+        sent += delivered
+        failed += len(group) - delivered
+    return sent, failed
+
+def process_due_notifications(limit=None):
+    """
+    Deliver notifications whose next attempt is due (requires an app context)
+
+    Returns:
+        tuple: (sent: int, failed: int)
+    """
+    limit = limit or NOTIFICATION_BATCH_SIZE
+    now = datetime.utcnow()
+    due_ids = [row.id for row in db.session.query(NotificationOutbox.id).filter(
+        NotificationOutbox.status == 'pending',
+        NotificationOutbox.next_attempt_at <= now,
+    ).order_by(NotificationOutbox.next_attempt_at).limit(limit)]
+    db.session.commit()
+
+    claimed = [entry_id for entry_id in due_ids if _claim(entry_id, now)]
+    if not claimed:
+        return 0, 0
+    entries = NotificationOutbox.query.filter(NotificationOutbox.id.in_(claimed)) \
+        .order_by(NotificationOutbox.id).all()
+    return _deliver(entries)
+
+def requeue_dead_notifications():
+    """Move dead-lettered notifications back to the queue, returns how many were requeued"""
+    count = NotificationOutbox.query.filter_by(status='dead').update({
+        NotificationOutbox.status: 'pending',
+        NotificationOutbox.attempts: 0,
+        NotificationOutbox.next_attempt_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    db.session.commit()
+    return count
+
+def run_worker(stop_event=None):
+    """Drain the outbox until stop_event is set, waking early on new notifications"""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        _wake_event.clear()
+        sent = failed = 0
+        try:
+            with app.app_context():
+                sent, failed = process_due_notifications()
+        except Exception as e:
+            logger.error(f"Notification worker error: {str(e)}")
+        # Telegram API metrics of a worker without web requests are only written here
+        metrics_store.flush(registry)
+        if sent + failed >= NOTIFICATION_BATCH_SIZE:
+            # Backlog left, keep draining without waiting
+            continue
+        if _wake_event.wait(NOTIFICATION_POLL_INTERVAL) and TELEGRAM_BATCH_WINDOW > 0:
+            # Let a burst of submissions accumulate into one digest
+            stop_event.wait(TELEGRAM_BATCH_WINDOW)
+
+def ensure_worker_started():
+    """Start the background delivery thread once per process (gunicorn forks workers)"""
+    global _worker_pid
+    if NOTIFICATION_WORKER_MODE != 'thread' or _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        thread = threading.Thread(target=run_worker, name='notification-worker', daemon=True)
+        thread.start()
+        _worker_pid = os.getpid()
+        logger.info("Notification worker thread started")
+
+def wake_worker():
+    """Signal the delivery thread that new notifications were committed"""
+    _wake_event.set()
+
+@app.before_request
+def _start_notification_worker():
+    """Lazily start delivery in each web worker on its first request"""
+    ensure_worker_started()
+
+@app.cli.command('notifications-worker')
+def notifications_worker_command():
+    """Run the notification delivery loop in the foreground"""
+    logger.info("Notification worker running")
+    stop_event = threading.Event()
+    # systemd stops the worker with SIGTERM: finish the current batch and flush metrics
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    try:
+        run_worker(stop_event)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        metrics_store.flush(registry, force=True)
+        logger.info("Notification worker stopped")
+
+@app.cli.command('notifications-requeue')
+def notifications_requeue_command():
+    """Requeue dead-lettered notifications"""
+    count = requeue_dead_notifications()
+    click.echo(f"Requeued {count} notifications")
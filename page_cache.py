@@ -0,0 +1,89 @@
+"""
+Rendered-page cache for public pages.
+
+Anonymous visitors of a page like the landing page get the same HTML except
+for the CSRF token and any flash messages. The page is rendered once per
+worker and cache version with both replaced by slot markers, kept as a list
+of fragments, and every request only joins the fragments around a fresh CSRF
+token and its own flash messages.
+
+The cache version (PAGE_CACHE_VERSION, or a hash of the templates and the
+asset manifest) is part of the key, so a deploy never serves old markup.
+"""
+
+import hashlib
+import os
+import re
+
+from flask import render_template, session
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+
+from app import app
+from assets import MANIFEST_FILE
+from cache import MemoryCache
+from config import PAGE_CACHE_ENABLED, PAGE_CACHE_TTL, PAGE_CACHE_VERSION
+
+CSRF_SLOT = '\x00csrf\x00'
+FLASH_SLOT = '\x00flashes\x00'
+_SLOTS = re.compile(f'({re.escape(CSRF_SLOT)}|{re.escape(FLASH_SLOT)})')
+
+# Fragments per (page, version); small and CPU-bound, so per worker
+page_cache = MemoryCache(default_ttl=PAGE_CACHE_TTL, max_entries=64)
+
+_version = None
+
+def cache_version():
+    """PAGE_CACHE_VERSION, or a hash of template and asset manifest files computed once per worker"""
+    global _version
+    if PAGE_CACHE_VERSION:
+        return PAGE_CACHE_VERSION
+    if _version is None:
+        digest = hashlib.sha1()
+        paths = [MANIFEST_FILE]
+        template_dir = os.path.join(app.root_path, app.template_folder)
+        for root, _, files in os.walk(template_dir):
+            paths.extend(os.path.join(root, name) for name in files)
+        for path in sorted(paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size}\n'.encode('utf-8'))
+        _version = digest.hexdigest()[:12]
+    return _version
+
+def _cacheable():
+    # Employees see their name in the navigation; template reloading is for development
+    return PAGE_CACHE_ENABLED and 'employee_id' not in session and not app.jinja_env.auto_reload
+
+def render_cached(template, context):
+    """
+    render_template for pages that differ between anonymous visitors only by
+    CSRF token and flash messages
+
+    Args:
+        template: Template name
+        context: Callable returning the template context, only called on a cache miss
+
+    Returns:
+        str: HTML
+    """
+    if not _cacheable():
+        return render_template(template, **context())
+
+    key = f'page:{template}:{cache_version()}'
+    fragments = page_cache.get(key)
+    if fragments is None:
+        html = render_template(template, flash_slot=Markup(FLASH_SLOT), **context())
+        token = generate_csrf()
+        if token:
+            html = html.replace(token, CSRF_SLOT)
+        fragments = _SLOTS.split(html)
+        page_cache.set(key, fragments)
+
+    slots = {
+        CSRF_SLOT: generate_csrf(),
+        FLASH_SLOT: render_template('flash_messages.html') if session.get('_flashes') else '',
+    }
+    return ''.join(slots.get(fragment, fragment) for fragment in fragments)
@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination over requests ordered by (created_at, id) descending
+"""
+
+import base64
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+from config import PAGE_SIZE, MAX_PAGE_SIZE
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+def encode_cursor(created_at, row_id):
+    """Encode a row position as an opaque URL-safe cursor"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (created_at: datetime, id: int) or None if the cursor is invalid
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def parse_page_size(value):
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE, falling back to PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def keyset_page(query, model, after=None, before=None, limit=PAGE_SIZE):
+    """
+    Fetch one page of a query, newest first.
+
+    Args:
+        query: Filtered query without ordering
+        model: Mapped class with created_at and id columns
+        after: Cursor of the last row of the previous page (older rows follow)
+        before: Cursor of the first row of the next page (newer rows precede)
+        limit: Page size
+
+    Returns:
+        Page(items, next_cursor, prev_cursor)
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key:
+        created_at, row_id = before_key
+        rows = query.filter(or_(
+            model.created_at > created_at,
+            and_(model.created_at == created_at, model.id > row_id),
+        )).order_by(model.created_at.asc(), model.id.asc()).limit(limit + 1).all()
+        items = list(reversed(rows[:limit]))
+        has_newer = len(rows) > limit
+        has_older = True
+    else:
+        if after_key:
+            created_at, row_id = after_key
+            query = query.filter(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id),
+            ))
+        rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+        items = rows[:limit]
+        has_older = len(rows) > limit
+        has_newer = after_key is not None
+
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if items and has_older else None
+    prev_cursor = encode_cursor(items[0].created_at, items[0].id) if items and has_newer else None
+    return Page(items, next_cursor, prev_cursor)
@@ -0,0 +1,177 @@
+"""
+Vehicle loads and stop order for same-day Astana deliveries.
+
+Stops are mapped to districts by street keywords, packed into vehicle loads
+with first-fit decreasing (preferring loads that already serve a nearby
+district), and each load is ordered by nearest neighbour followed by 2-opt
+over the precomputed district distance matrix in data/astana_districts.json.
+
+Only the standard library is used here, so plans can run in pool processes
+without importing the application.
+"""
+
+import json
+from collections import namedtuple
+from functools import lru_cache
+
+Stop = namedtuple('Stop', ['request_id', 'address', 'weight', 'volume', 'district'])
+Districts = namedtuple('Districts', ['names', 'keywords', 'matrix', 'depot'])
+
+TWO_OPT_MAX_PASSES = 50
+
+@lru_cache(maxsize=4)
+def load_districts(path):
+    """
+    Read the district list and distance matrix
+
+    Returns:
+        Districts: names, (keyword, index) pairs longest first, matrix in km, depot index
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    names = [district['name'] for district in data['districts']]
+    keywords = sorted(((keyword.lower().replace('ё', 'е'), index)
+                       for index, district in enumerate(data['districts'])
+                       for keyword in district['keywords']),
+                      key=lambda item: -len(item[0]))
+    matrix = data['matrix']
+    if len(matrix) != len(names) or any(len(row) != len(names) for row in matrix):
+        raise ValueError(f'{path}: distance matrix must be {len(names)}x{len(names)}')
+    return Districts(names, keywords, matrix, data.get('depot', 0))
+
+def locate(address, districts):
+    """District index of an address by its longest matching street keyword, None if unknown"""
+    text = (address or '').lower().replace('ё', 'е')
+    for keyword, index in districts.keywords:
+        if keyword in text:
+            return index
+    return None
+
+def pack_loads(stops, matrix, max_weight, max_volume, max_stops):
+    """
+    Group stops into vehicle loads within the weight, volume and stop limits
+
+    First-fit decreasing by each stop's dominant share of the vehicle; among
+    loads with room the one already closest to the stop's district wins, then
+    the fullest. A stop too big for any vehicle gets a load of its own.
+
+    Returns:
+        list of dicts: {'stops', 'weight', 'volume', 'oversize'}
+    """
+    def share(stop):
+        return max(stop.weight / max_weight if max_weight else 0, stop.volume / max_volume if max_volume else 0)
+
+    size = len(matrix)
+    loads = []
+    open_loads = []
+    for stop in sorted(stops, key=share, reverse=True):
+        if share(stop) > 1:
+            loads.append({'stops': [stop], 'weight': stop.weight, 'volume': stop.volume, 'oversize': True})
+            continue
+
+        best = None
+        best_key = None
+        for load in open_loads:
+            if ((max_weight and load['weight'] + stop.weight > max_weight) or
+                    (max_volume and load['volume'] + stop.volume > max_volume)):
+                continue
+            key = (load['closeness'][stop.district], -load['used'])
+            if best_key is None or key < best_key:
+                best, best_key = load, key
+
+        if best is None:
+            best = {'stops': [], 'weight': 0.0, 'volume': 0.0, 'used': 0.0, 'oversize': False,
+                    'closeness': [float('inf')] * size}
+            loads.append(best)
+            open_loads.append(best)
+
+        best['stops'].append(stop)
+        best['weight'] += stop.weight
+        best['volume'] += stop.volume
+        best['used'] = max(best['weight'] / max_weight if max_weight else 0,
+                           best['volume'] / max_volume if max_volume else 0)
+        # Distance from every district to the nearest district this load already serves
+        best['closeness'] = [min(current, matrix[stop.district][k]) for k, current in enumerate(best['closeness'])]
+        if len(best['stops']) >= max_stops:
+            open_loads = [load for load in open_loads if load is not best]
+
+    for load in loads:
+        load.pop('closeness', None)
+        load.pop('used', None)
+    return loads
+
+def tour_length(order, matrix, depot):
+    """Length of depot -> stops -> depot in km"""
+    route = [depot] + [stop.district for stop in order] + [depot]
+    return sum(matrix[a][b] for a, b in zip(route, route[1:]))
+
+def nearest_neighbour(stops, matrix, depot):
+    """Greedy tour from the depot; equally distant stops are taken in address order"""
+    remaining = sorted(stops, key=lambda stop: stop.address)
+    order = []
+    here = depot
+    while remaining:
+        nearest = min(remaining, key=lambda stop: matrix[here][stop.district])
+        remaining.remove(nearest)
+        order.append(nearest)
+        here = nearest.district
+    return order
+
+def two_opt(order, matrix, depot, max_passes=TWO_OPT_MAX_PASSES):
+    """Reverse route segments while that shortens the closed tour"""
+    route = [depot] + [stop.district for stop in order] + [depot]
+    order = list(order)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, len(route) - 2):
+            for j in range(i + 1, len(route) - 1):
+                a, b, c, d = route[i - 1], route[i], route[j], route[j + 1]
+                if matrix[a][c] + matrix[b][d] < matrix[a][b] + matrix[c][d] - 1e-9:
+                    route[i:j + 1] = route[i:j + 1][::-1]
+                    order[i - 1:j] = order[i - 1:j][::-1]
+                    improved = True
+        if not improved:
+            break
+    return order
+
+def plan_routes(stops, districts_path, max_weight, max_volume, max_stops):
+    """
+    Plan vehicle loads and stop order for one day
+
+    Args:
+        stops: Iterable of (request_id, address, weight, volume) tuples
+        districts_path: Path of the district list and distance matrix JSON
+        max_weight: Vehicle capacity in kg, 0 for no limit
+        max_volume: Vehicle capacity in m³, 0 for no limit
+        max_stops: Maximum stops per vehicle
+
+    Returns:
+        dict: {'loads': [{'stops': [...], 'weight_kg', 'volume_m3', 'distance_km', 'oversize'}],
+               'unlocated': [...], 'total_km'}
+    """
+    districts = load_districts(districts_path)
+    located = []
+    unlocated = []
+    for request_id, address, weight, volume in stops:
+        stop = Stop(request_id, address, weight or 0.0, volume or 0.0, locate(address, districts))
+        (unlocated if stop.district is None else located).append(stop)
+
+    loads = []
+    for load in pack_loads(located, districts.matrix, max_weight, max_volume, max_stops):
+        order = two_opt(nearest_neighbour(load['stops'], districts.matrix, districts.depot),
+                        districts.matrix, districts.depot)
+        loads.append({
+            'stops': [{'request_id': stop.request_id, 'address': stop.address, 'weight_kg': stop.weight,
+                       'volume_m3': stop.volume, 'district': districts.names[stop.district]} for stop in order],
+            'weight_kg': round(load['weight'], 1),
+            'volume_m3': round(load['volume'], 2),
+            'distance_km': round(tour_length(order, districts.matrix, districts.depot), 1),
+            'oversize': load['oversize'],
+        })
+
+    return {
+        'loads': loads,
+        'unlocated': [{'request_id': stop.request_id, 'address': stop.address, 'weight_kg': stop.weight,
+                       'volume_m3': stop.volume} for stop in unlocated],
+        'total_km': round(sum(load['distance_km'] for load in loads), 1),
+    }
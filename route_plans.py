@@ -0,0 +1,126 @@
+"""
+Route plan jobs: collect a day's processing Astana requests, plan them in a
+process pool and store the result, so web workers only enqueue and poll.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+
+from app import app, db
+from models import Request, RoutePlan
+from route_planner import plan_routes
+from config import (
+    ROUTE_VEHICLE_WEIGHT_KG,
+    ROUTE_VEHICLE_VOLUME_M3,
+    ROUTE_MAX_STOPS,
+    ROUTE_PLANNER_PROCESSES,
+    ROUTE_PLAN_TIMEOUT,
+    ROUTE_DISTRICTS_FILE,
+)
+
+logger = logging.getLogger(__name__)
+
+DISTRICTS_FILE = ROUTE_DISTRICTS_FILE or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      'data', 'astana_districts.json')
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Process pool of this worker, created on first use (gunicorn forks workers)"""
+    global _executor, _executor_pid
+    if _executor_pid == os.getpid():
+        return _executor
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            # spawn, not fork: web workers run background threads that must not be copied mid-lock
+            _executor = ProcessPoolExecutor(max_workers=ROUTE_PLANNER_PROCESSES,
+                                            mp_context=multiprocessing.get_context('spawn'))
+            _executor_pid = os.getpid()
+    return _executor
+
+def collect_stops(delivery_date):
+    """(request_id, address, weight, volume) of processing Astana requests due on a date"""
+    return [tuple(row) for row in db.session.query(
+        Request.id, Request.customer_address, Request.cargo_weight, Request.cargo_volume,
+    ).filter(
+        Request.delivery_type == 'astana',
+        Request.status == 'processing',
+        Request.preferred_delivery_date == delivery_date,
+    ).order_by(Request.id)]
+
+def _plan_arguments(stops):
+    return stops, DISTRICTS_FILE, ROUTE_VEHICLE_WEIGHT_KG, ROUTE_VEHICLE_VOLUME_M3, ROUTE_MAX_STOPS
+
+def _store_result(plan_id, result=None, error=None):
+    with app.app_context():
+        plan = db.session.get(RoutePlan, plan_id)
+        if plan is None:
+            return
+        plan.finished_at = datetime.utcnow()
+        if error is None:
+            plan.status = 'done'
+            plan.result = json.dumps(result, ensure_ascii=False)
+            plan.vehicle_count = len(result['loads'])
+            plan.total_km = result['total_km']
+        else:
+            plan.status = 'failed'
+            plan.error = error
+            logger.error(f"Route plan {plan_id} failed: {error}")
+        db.session.commit()
+
+def start_route_plan(delivery_date, employee_id=None):
+    """
+    Create a plan for a day and compute it in the background
+
+    Returns:
+        RoutePlan in 'running' state
+    """
+    stops = collect_stops(delivery_date)
+    plan = RoutePlan(delivery_date=delivery_date, delivery_type='astana', status='running',
+                     created_by=employee_id, request_count=len(stops))
+    db.session.add(plan)
+    db.session.commit()
+    plan_id = plan.id
+
+    def done(future):
+        error = future.exception()
+        _store_result(plan_id, None if error else future.result(), str(error) if error else None)
+
+    get_executor().submit(plan_routes, *_plan_arguments(stops)).add_done_callback(done)
+    return plan
+
+def expire_stale_plans():
+    """Fail plans whose worker died before storing a result"""
+    cutoff = datetime.utcnow() - timedelta(seconds=ROUTE_PLAN_TIMEOUT)
+    expired = RoutePlan.query.filter(RoutePlan.status == 'running', RoutePlan.created_at < cutoff).update({
+        RoutePlan.status: 'failed',
+        RoutePlan.error: 'Timed out',
+        RoutePlan.finished_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    db.session.commit()
+    return expired
+
+@app.cli.command('plan-routes')
+@click.argument('delivery_date', type=click.DateTime(formats=['%Y-%m-%d']))
+def plan_routes_command(delivery_date):
+    """Plan vehicle loads for processing Astana requests due on DELIVERY_DATE (YYYY-MM-DD)"""
+    stops = collect_stops(delivery_date.date())
+    started = datetime.utcnow()
+    result = plan_routes(*_plan_arguments(stops))
+    plan = RoutePlan(delivery_date=delivery_date.date(), delivery_type='astana', status='running',
+                     request_count=len(stops), created_at=started)
+    db.session.add(plan)
+    db.session.commit()
+    _store_result(plan.id, result)
+    click.echo(f"Plan {plan.id}: {len(stops)} stops, {len(result['loads'])} vehicles, "
+               f"{result['total_km']} km, {len(result['unlocated'])} unrecognized addresses "
+               f"({(datetime.utcnow() - started).total_seconds():.2f}s)")
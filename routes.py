@@ -1,13 +1,37 @@
-from flask import render_template, request, redirect, url_for, flash, session, jsonify
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
 from app import app, db
-from models import Employee, Request
-from forms import RegistrationForm, LoginForm, RequestForm, TrackingForm
+from models import Employee, Request, RequestArchive, RoutePlan, normalize_phone
+from forms import RegistrationForm, LoginForm, RequestForm, TrackingForm, ImportForm, BulkStatusForm, RoutePlanForm
 from telegram_service import send_telegram_notification, test_telegram_connection
-from datetime import datetime
+from notification_worker import enqueue_notification, wake_worker
+from pagination import Page, keyset_page, parse_page_size
+from cache import tracking_cache, tracking_cache_key, invalidate_tracking
+from event_stream import broker as event_broker, publish_request_event
+from bulk_io import detect_format, export_requests, import_requests
+from status_counters import STATUSES, adjust_status_counter, employee_status_counts, record_status_change
+from search import search_requests
+from status_transitions import UPDATED, bulk_update_status
+from status_history import record_status_transition, status_time_report
+from capacity import book_capacity, booking_warning, capacity_calendar
+from route_plans import expire_stale_plans, start_route_plan
+from page_cache import render_cached
+from archive import archived_tracking_query
+from db_routing import read_primary
+from submit_guard import (PENDING, claim_submission, complete_submission, release_submission,
+                          submission_key, throttle_submission)
+from config import BULK_STATUS_MAX_IDS, CAPACITY_CALENDAR_DAYS
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+import io
+import json
+import math
 
 @app.route('/')
 def index():
     """Main page with request forms"""
+    return render_cached('index.html', _index_context)
+
+def _index_context():
     astana_form = RequestForm()
     regions_form = RequestForm()
     tracking_form = TrackingForm()
@@ -16,10 +40,7 @@ def index():
     astana_form.delivery_type.data = 'astana'
     regions_form.delivery_type.data = 'regions'
     
-    return render_template('index.html', 
-                         astana_form=astana_form, 
-                         regions_form=regions_form,
-                         tracking_form=tracking_form)
+    return dict(astana_form=astana_form, regions_form=regions_form, tracking_form=tracking_form)
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -81,16 +102,150 @@ def dashboard():
         flash('Сессия истекла. Войдите в систему заново.', 'warning')
         return redirect(url_for('login'))
     
-    # Get employee's requests
-    employee_requests = Request.query.filter_by(employee_id=employee.id).order_by(Request.created_at.desc()).all()
+    # Get one page of employee's requests
+    page = _employee_requests_page(employee.id)
+    
+    # Maintained status counters for the summary cards
+    stats = employee_status_counts(employee.id)
     
-    return render_template('dashboard.html', employee=employee, requests=employee_requests)
+    return render_template('dashboard.html', employee=employee, requests=page.items, page=page, stats=stats,
+                           import_form=ImportForm(), bulk_status_form=BulkStatusForm())
+
+@app.route('/dashboard/stats')
+def dashboard_stats():
+    """Employee's request counters by status as JSON, polled by the dashboard"""
+    if 'employee_id' not in session:
+        return jsonify(error='Доступ запрещен.'), 401
+    
+    return jsonify(employee_status_counts(session['employee_id']))
+
+@app.route('/dashboard/requests')
+def dashboard_requests_json():
+    """One page of employee's requests as JSON for infinite scroll"""
+    if 'employee_id' not in session:
+        return jsonify(error='Доступ запрещен.'), 401
+    
+    page = _employee_requests_page(session['employee_id'])
+    return _page_json(page, 'dashboard_rows.html', 'requests', 'dashboard', 'dashboard_requests_json')
+
+@app.route('/search')
+def search():
+    """Full-text search over requests (employee only)"""
+    if 'employee_id' not in session:
+        flash('Доступ запрещен.', 'error')
+        return redirect(url_for('login'))
+    
+    query = request.args.get('q', '').strip()
+    status = request.args.get('status') if request.args.get('status') in STATUSES else None
+    mine = request.args.get('mine') == '1'
+    
+    orders = []
+    if query:
+        orders = search_requests(query, employee_id=session['employee_id'] if mine else None, status=status)
+        if not orders:
+            flash(f'По запросу «{query}» ничего не найдено.', 'info')
+    
+    return render_template('search.html', orders=orders, query=query, status=status, mine=mine,
+                           statuses=STATUSES)
+
+@app.route('/requests/import', methods=['POST'])
+def import_requests_upload():
+    """Bulk import of requests from a CSV/JSONL upload (employee only)"""
+    if 'employee_id' not in session:
+        flash('Доступ запрещен.', 'error')
+        return redirect(url_for('login'))
+    
+    wants_json = request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html
+    form = ImportForm()
+    if not form.validate_on_submit():
+        if wants_json:
+            return jsonify(errors=form.errors), 400
+        for errors in form.errors.values():
+            for error in errors:
+                flash(f'Ошибка импорта: {error}', 'error')
+        return redirect(url_for('dashboard'))
+    
+    upload = form.file.data
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        report = import_requests(stream, detect_format(upload.filename), session['employee_id'])
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Bulk import error: {e}")
+        if wants_json:
+            return jsonify(error=str(e)), 500
+        flash('Ошибка при импорте файла. Попробуйте еще раз.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    if wants_json:
+        return jsonify(report)
+    
+    flash(f'Импортировано заявок: {report["imported"]}, отклонено строк: {report["failed"]}.',
+          'success' if not report['failed'] else 'warning')
+    for error in report['errors'][:10]:
+        messages = '; '.join(f'{field}: {", ".join(errors)}' for field, errors in error['errors'].items())
+        flash(f'Строка {error["line"]}: {messages}', 'error')
+    return redirect(url_for('dashboard'))
+
+@app.route('/requests/export')
+def export_requests_download():
+    """Stream employee's requests as CSV or JSONL (employee only)"""
+    if 'employee_id' not in session:
+        flash('Доступ запрещен.', 'error')
+        return redirect(url_for('login'))
+    
+    fmt = 'jsonl' if request.args.get('format') == 'jsonl' else 'csv'
+    mimetype = 'application/x-ndjson' if fmt == 'jsonl' else 'text/csv'
+    filename = f'requests-{datetime.now().strftime("%Y%m%d-%H%M%S")}.{fmt}'
+    return Response(stream_with_context(export_requests(fmt, session['employee_id'])),
+                    mimetype=f'{mimetype}; charset=utf-8',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+def _employee_requests_page(employee_id):
+    """Keyset page of employee's requests using after/before/limit query parameters"""
+    return keyset_page(Request.query.filter_by(employee_id=employee_id), Request,
+                       after=request.args.get('after'),
+                       before=request.args.get('before'),
+                       limit=parse_page_size(request.args.get('limit')))
+
+def _page_json(page, rows_template, rows_name, html_endpoint, json_endpoint, **url_args):
+    """Serialize a page with its rendered table rows and links to the neighbouring pages"""
+    return jsonify(
+        items=[item.to_dict() for item in page.items],
+        html=render_template(rows_template, **{rows_name: page.items}),
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+        next_url=url_for(json_endpoint, after=page.next_cursor, **url_args) if page.next_cursor else None,
+        next_page_url=url_for(html_endpoint, after=page.next_cursor, **url_args) if page.next_cursor else None,
+    )
 
 @app.route('/submit_request', methods=['POST'])
 def submit_request():
     """Submit a new shipping request"""
     form = RequestForm()
+    employee = 'employee_id' in session
+    # Anonymous clients are throttled per IP before any other work
+    if not employee:
+        wait = throttle_submission('ip', request.remote_addr)
+        if wait:
+            return _submission_throttled(wait)
+    
     if form.validate_on_submit():
+        # Repeats of a recent submission are answered without touching the database
+        key = submission_key(form)
+        duplicate_of = claim_submission(key)
+        if duplicate_of is not None:
+            if duplicate_of == PENDING:
+                flash('Заявка уже отправлена и обрабатывается.', 'info')
+            else:
+                flash(f'Заявка №{duplicate_of} уже принята, повторно отправлять не нужно.', 'info')
+            return redirect(url_for('dashboard') if employee else url_for('index'))
+        if not employee:
+            wait = throttle_submission('phone', normalize_phone(form.customer_phone.data))
+            if wait:
+                release_submission(key)
+                return _submission_throttled(wait)
+        
         try:
             # Create new request
             new_request = Request()
@@ -104,12 +259,28 @@ def submit_request():
             new_request.special_instructions = form.special_instructions.data
             new_request.preferred_delivery_date = form.preferred_delivery_date.data
             
+            new_request.status = 'pending'
+            
+            # Book the cargo on its delivery day, refused days stop here
+            booking = None
+            if new_request.preferred_delivery_date:
+                booking = book_capacity(new_request.preferred_delivery_date, new_request.delivery_type,
+                                        new_request.cargo_weight, new_request.cargo_volume)
+                if not booking.accepted:
+                    db.session.rollback()
+                    release_submission(key)
+                    flash(f'На {new_request.preferred_delivery_date.strftime("%d.%m.%Y")} доставка уже полностью '
+                          f'загружена. Пожалуйста, выберите другую дату.', 'error')
+                    return redirect(url_for('dashboard') if 'employee_id' in session else url_for('index'))
+            
             # If employee is logged in, associate request with them
             if 'employee_id' in session:
                 new_request.employee_id = session['employee_id']
             
             db.session.add(new_request)
-            db.session.commit()
+            db.session.flush()
+            adjust_status_counter(new_request.employee_id, new_request.status, 1)
+            publish_request_event(new_request, 'request_created')
             
             # Prepare data for Telegram notification
             request_data = {
@@ -125,12 +296,18 @@ def submit_request():
                 'request_id': new_request.id
             }
             
-            # Send Telegram notification
-            success, message = send_telegram_notification(request_data, new_request.delivery_type)
-            if not success:
-                app.logger.warning(f"Telegram notification failed: {message}")
+            # Queue Telegram notification in the same transaction as the request
+            enqueue_notification(request_data, new_request.delivery_type, new_request.id)
+            db.session.commit()
+            complete_submission(key, new_request.id)
+            wake_worker()
+            event_broker.notify()
+            invalidate_tracking(new_request.customer_phone_normalized)
             
             flash(f'Заявка №{new_request.id} успешно подана!', 'success')
+            if booking and booking_warning(booking):
+                flash(f'Внимание: доставка на {new_request.preferred_delivery_date.strftime("%d.%m.%Y")} '
+                      f'загружена почти полностью или сверх нормы, дата может быть перенесена.', 'warning')
             
             # Redirect to dashboard if employee is logged in, otherwise to main page
             if 'employee_id' in session:
@@ -140,6 +317,7 @@ def submit_request():
                 
         except Exception as e:
             db.session.rollback()
+            release_submission(key)
             flash('Ошибка при подаче заявки. Попробуйте еще раз.', 'error')
             app.logger.error(f"Request submission error: {e}")
     else:
@@ -154,20 +332,84 @@ def submit_request():
     
     return redirect(url_for('index'))
 
+def _submission_throttled(wait):
+    """429 with Retry-After for API clients, a flash message for the browser form"""
+    retry_after = max(1, math.ceil(wait))
+    app.logger.info(f"Request submission throttled for {request.remote_addr}, retry in {retry_after}s")
+    if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+        response = jsonify(error='Too many requests', retry_after=retry_after)
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    flash(f'Слишком много заявок подряд. Попробуйте снова через {retry_after} сек.', 'error')
+    return redirect(url_for('index'))
+
 @app.route('/track_order', methods=['GET', 'POST'])
 def track_order():
     """Track orders by customer phone"""
     form = TrackingForm()
     orders = []
+    page = None
+    customer_phone = None
     
     if form.validate_on_submit():
         customer_phone = form.customer_phone.data
-        orders = Request.query.filter_by(customer_phone=customer_phone).order_by(Request.created_at.desc()).all()
+    elif request.method == 'GET' and request.args.get('phone'):
+        # Further result pages are plain GET links
+        customer_phone = request.args.get('phone')
+        form.customer_phone.data = customer_phone
+    
+    if customer_phone:
+        if any(request.args.get(arg) for arg in ('after', 'before', 'limit')):
+            page = _tracking_page(customer_phone)
+        else:
+            # First page is what waiting customers keep refreshing; it is loaded from the
+            # primary so a lagging replica cannot refill the cache after invalidate_tracking
+            page = tracking_cache.get_or_set(
+                tracking_cache_key(normalize_phone(customer_phone)),
+                lambda: _cached_tracking_page(customer_phone))
+        orders = page.items
         
-        if not orders:
+        if not orders and not page.prev_cursor:
             flash(f'Заказы для номера телефона {customer_phone} не найдены.', 'info')
     
-    return render_template('track_order.html', form=form, orders=orders)
+    return render_template('track_order.html', form=form, orders=orders, page=page, phone=customer_phone)
+
+@app.route('/track_order/results')
+def track_order_json():
+    """One page of tracking results as JSON for infinite scroll"""
+    customer_phone = request.args.get('phone', '')
+    if not normalize_phone(customer_phone):
+        return jsonify(error='Не указан номер телефона.'), 400
+    
+    page = _tracking_page(customer_phone)
+    return _page_json(page, 'track_order_rows.html', 'orders', 'track_order', 'track_order_json',
+                      phone=customer_phone)
+
+def _tracking_page(customer_phone):
+    """Keyset page of orders for a phone number using after/before/limit query parameters"""
+    phone = normalize_phone(customer_phone)
+    args = dict(after=request.args.get('after'),
+                before=request.args.get('before'),
+                limit=parse_page_size(request.args.get('limit')))
+    live = Request.query.filter_by(customer_phone_normalized=phone)
+    page = keyset_page(live, Request, **args)
+    if page.items:
+        return page
+    # The archive is only searched for phones without live orders
+    if (args['after'] or args['before']) and db.session.query(live.exists()).scalar():
+        return page
+    return keyset_page(archived_tracking_query(phone), RequestArchive, **args)
+
+def _cached_tracking_page(customer_phone):
+    with read_primary():
+        return _detached_page(_tracking_page(customer_phone))
+
+def _detached_page(page):
+    """Copy a page's rows into plain objects that can be cached outside the session"""
+    columns = [column.key for column in Request.__table__.columns]
+    items = [SimpleNamespace(**{key: getattr(item, key) for key in columns}) for item in page.items]
+    return Page(items, page.next_cursor, page.prev_cursor)
 
 @app.route('/update_request_status/<int:request_id>/<new_status>')
 def update_request_status(request_id, new_status):
@@ -185,14 +427,141 @@ def update_request_status(request_id, new_status):
     
     valid_statuses = ['pending', 'processing', 'shipped', 'delivered']
     if new_status in valid_statuses:
+        old_status = request_obj.status
+        record_status_change(request_obj.employee_id, old_status, new_status)
         request_obj.status = new_status
+        if old_status != new_status:
+            record_status_transition(request_obj, old_status, session['employee_id'])
+        publish_request_event(request_obj, 'status_changed', old_status)
         db.session.commit()
+        event_broker.notify()
+        invalidate_tracking(request_obj.customer_phone_normalized)
         flash(f'Статус заявки №{request_id} обновлен.', 'success')
     else:
         flash('Недопустимый статус.', 'error')
     
     return redirect(url_for('dashboard'))
 
+@app.route('/requests/status', methods=['POST'])
+def bulk_update_request_status():
+    """Move several requests to the next status at once (employee only)"""
+    if 'employee_id' not in session:
+        flash('Доступ запрещен.', 'error')
+        return redirect(url_for('login'))
+    
+    wants_json = request.is_json or (request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html)
+    form = BulkStatusForm()
+    if request.is_json:
+        raw_ids = (request.get_json(silent=True) or {}).get('request_ids') or []
+    else:
+        raw_ids = request.form.getlist('request_ids')
+    try:
+        request_ids = [int(request_id) for request_id in raw_ids]
+    except (TypeError, ValueError):
+        request_ids = None
+    
+    error = None
+    if not form.validate_on_submit():
+        error = '; '.join(message for messages in form.errors.values() for message in messages)
+    elif not request_ids:
+        error = 'Не выбрано ни одной заявки.' if request_ids is not None else 'Некорректные номера заявок.'
+    elif len(request_ids) > BULK_STATUS_MAX_IDS:
+        error = f'За один раз можно изменить не более {BULK_STATUS_MAX_IDS} заявок.'
+    if error:
+        if wants_json:
+            return jsonify(error=error), 400
+        flash(error, 'error')
+        return redirect(url_for('dashboard'))
+    
+    employee = Employee.query.get(session['employee_id'])
+    try:
+        result = bulk_update_status(employee, request_ids, form.status.data)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Bulk status update error: {e}")
+        if wants_json:
+            return jsonify(error='Ошибка при изменении статусов.'), 500
+        flash('Ошибка при изменении статусов. Попробуйте еще раз.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    updated = sum(1 for outcome in result.results.values() if outcome == UPDATED)
+    if updated:
+        wake_worker()
+        event_broker.notify()
+        for phone in result.updated_phones:
+            invalidate_tracking(phone)
+    
+    if wants_json:
+        return jsonify(status=form.status.data, updated=updated,
+                       results=[{'id': request_id, 'result': outcome} for request_id, outcome in result.results.items()])
+    
+    skipped = len(result.results) - updated
+    status_name = dict(form.status.choices)[form.status.data]
+    flash(f'Статус «{status_name}» установлен для заявок: {updated}.' if not skipped else
+          f'Статус изменен для заявок: {updated}, пропущено: {skipped} (недопустимый переход или чужая заявка).',
+          'success' if not skipped else 'warning')
+    return redirect(url_for('dashboard'))
+
+@app.route('/reports/status-times')
+def status_times_report():
+    """Time requests spend in each status per delivery type (employee only)"""
+    if 'employee_id' not in session:
+        flash('Доступ запрещен.', 'error')
+        return redirect(url_for('login'))
+    
+    report = status_time_report()
+    if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+        return jsonify(report)
+    return render_template('status_report.html', report=report, statuses=STATUSES[:-1])
+
+@app.route('/capacity')
+def capacity_view():
+    """Booked delivery load for the coming days (employee only)"""
+    if 'employee_id' not in session:
+        flash('Доступ запрещен.', 'error')
+        return redirect(url_for('login'))
+    
+    days = min(max(request.args.get('days', CAPACITY_CALENDAR_DAYS, type=int), 1), 90)
+    calendar = capacity_calendar(days)
+    if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+        return jsonify(days=[dict(day, date=day['date'].isoformat()) for day in calendar])
+    return render_template('capacity.html', calendar=calendar, days=days)
+
+@app.route('/routes', methods=['GET', 'POST'])
+def route_plans():
+    """Plan vehicle loads for a day's Astana deliveries (employee only)"""
+    if 'employee_id' not in session:
+        flash('Доступ запрещен.', 'error')
+        return redirect(url_for('login'))
+    
+    form = RoutePlanForm()
+    if form.validate_on_submit():
+        plan = start_route_plan(form.delivery_date.data, session['employee_id'])
+        if not plan.request_count:
+            flash(f'На {form.delivery_date.data.strftime("%d.%m.%Y")} нет заявок по Астане в обработке.', 'info')
+        return redirect(url_for('route_plan_detail', plan_id=plan.id))
+    if form.delivery_date.data is None:
+        form.delivery_date.data = date.today() + timedelta(days=1)
+    
+    expire_stale_plans()
+    plans = RoutePlan.query.order_by(RoutePlan.id.desc()).limit(20).all()
+    return render_template('route_plans.html', form=form, plans=plans)
+
+@app.route('/routes/<int:plan_id>')
+def route_plan_detail(plan_id):
+    """One route plan, refreshed by the page while it is computed (employee only)"""
+    if 'employee_id' not in session:
+        flash('Доступ запрещен.', 'error')
+        return redirect(url_for('login'))
+    
+    plan = RoutePlan.query.get_or_404(plan_id)
+    result = json.loads(plan.result) if plan.result else None
+    if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+        return jsonify(id=plan.id, status=plan.status, delivery_date=plan.delivery_date.isoformat(),
+                       request_count=plan.request_count, error=plan.error, result=result)
+    return render_template('route_plan.html', plan=plan, result=result)
+
 @app.route('/admin/telegram', methods=['GET', 'POST'])
 def telegram_admin():
     """Telegram configuration and testing (employee only)"""
@@ -233,6 +602,28 @@ def telegram_admin():
     
     return render_template('telegram_admin.html')
 
+@app.route('/admin/cache')
+def cache_stats():
+    """Tracking cache hit/miss counters (employee only)"""
+    if 'employee_id' not in session:
+        return jsonify(error='Доступ запрещен.'), 401
+    
+    return jsonify(tracking=tracking_cache.stats())
+
+@app.template_filter('duration')
+def format_duration(seconds):
+    """Human readable duration: 2 д 4 ч, 3 ч 15 мин, 12 мин"""
+    if seconds is None:
+        return '—'
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f'{days} д {hours} ч'
+    if hours:
+        return f'{hours} ч {minutes} мин'
+    return f'{minutes} мин'
+
 @app.context_processor
 def inject_status_names():
     """Inject status display names into templates"""
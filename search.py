@@ -0,0 +1,146 @@
+"""
+Full-text search over requests for employees.
+
+SQLite keeps an FTS5 table maintained by triggers; PostgreSQL a generated
+tsvector column with a GIN index. Both are updated incrementally by the
+database itself on every insert and change, including bulk imports.
+Queries match every word by prefix, so partial words still find results.
+"""
+
+import logging
+import re
+
+from app import db
+from models import Request
+
+logger = logging.getLogger(__name__)
+
+SEARCH_COLUMNS = ['customer_name', 'customer_address', 'cargo_description', 'special_instructions']
+MAX_TERMS = 8
+
+def normalize_text(text):
+    """Lowercase and fold 'ё' to 'е' so both spellings match"""
+    return (text or '').lower().replace('ё', 'е')
+
+def tokenize(query):
+    """Split a search query into normalized word tokens (Cyrillic and Latin)"""
+    return re.findall(r'\w+', normalize_text(query))[:MAX_TERMS]
+
+def _sqlite_folded(column, prefix):
+    return f"replace(replace(coalesce({prefix}.{column}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+def _ensure_sqlite_index():
+    columns = ', '.join(SEARCH_COLUMNS)
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'request_fts'")).first()
+    if exists:
+        return
+    db.session.execute(db.text(
+        f"CREATE VIRTUAL TABLE request_fts USING fts5({columns}, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ))
+    new_values = ', '.join(_sqlite_folded(column, 'new') for column in SEARCH_COLUMNS)
+    db.session.execute(db.text(
+        f"CREATE TRIGGER request_fts_insert AFTER INSERT ON request BEGIN "
+        f"INSERT INTO request_fts (rowid, {columns}) VALUES (new.id, {new_values}); END"
+    ))
+    db.session.execute(db.text(
+        f"CREATE TRIGGER request_fts_update AFTER UPDATE OF {columns} ON request BEGIN "
+        f"DELETE FROM request_fts WHERE rowid = old.id; "
+        f"INSERT INTO request_fts (rowid, {columns}) VALUES (new.id, {new_values}); END"
+    ))
+    db.session.execute(db.text(
+        "CREATE TRIGGER request_fts_delete AFTER DELETE ON request BEGIN "
+        "DELETE FROM request_fts WHERE rowid = old.id; END"
+    ))
+    existing_values = ', '.join(_sqlite_folded(column, 'request') for column in SEARCH_COLUMNS)
+    db.session.execute(db.text(
+        f"INSERT INTO request_fts (rowid, {columns}) SELECT request.id, {existing_values} FROM request"
+    ))
+    db.session.commit()
+    logger.info("Created FTS5 search index for requests")
+
+def _ensure_postgresql_index():
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'request' AND column_name = 'search_vector'")).first()
+    if exists:
+        return
+    document = " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+    db.session.execute(db.text(
+        f"ALTER TABLE request ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        f"(to_tsvector('russian', replace(lower({document}), 'ё', 'е'))) STORED"
+    ))
+    db.session.execute(db.text(
+        "CREATE INDEX IF NOT EXISTS ix_request_search_vector ON request USING GIN (search_vector)"
+    ))
+    db.session.commit()
+    logger.info("Created tsvector search index for requests")
+
+def ensure_search_index():
+    """Create the dialect's search index and fill it from existing rows (idempotent)"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        _ensure_sqlite_index()
+    elif dialect == 'postgresql':
+        _ensure_postgresql_index()
+
+def _matching_ids(terms, filters, params, limit):
+    dialect = db.engine.dialect.name
+    where = ''.join(f' AND {condition}' for condition in filters)
+    params = dict(params, limit=limit)
+
+    if dialect == 'sqlite':
+        params['query'] = ' AND '.join(f'"{term}"*' for term in terms)
+        sql = ("SELECT request.id FROM request_fts JOIN request ON request.id = request_fts.rowid "
+               f"WHERE request_fts MATCH :query{where} ORDER BY request_fts.rank LIMIT :limit")
+    elif dialect == 'postgresql':
+        params['query'] = ' & '.join(f'{term}:*' for term in terms)
+        sql = ("SELECT request.id FROM request, to_tsquery('russian', :query) AS query "
+               f"WHERE request.search_vector @@ query{where} "
+               "ORDER BY ts_rank(request.search_vector, query) DESC, request.id DESC LIMIT :limit")
+    else:
+        # No full-text support: plain substring scan
+        clauses = []
+        for i, term in enumerate(terms):
+            params[f'term{i}'] = f'%{term}%'
+            clauses.append('(' + ' OR '.join(f'lower({column}) LIKE :term{i}' for column in SEARCH_COLUMNS) + ')')
+        sql = (f"SELECT request.id FROM request WHERE {' AND '.join(clauses)}{where} "
+               "ORDER BY request.created_at DESC LIMIT :limit")
+
+    # Marked read-only so the replica serves it and it does not count as a write
+    statement = db.text(sql).execution_options(read_only=True)
+    return [row[0] for row in db.session.execute(statement, params)]
+
+def search_requests(query, employee_id=None, status=None, limit=50):
+    """
+    Find requests whose customer name, address, cargo description or
+    instructions contain every word of the query (by prefix), best match first
+
+    Args:
+        query: Free-text search query
+        employee_id: Only requests of this employee
+        status: Only requests in this status
+        limit: Maximum number of results
+
+    Returns:
+        List of Request objects
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+
+    filters = []
+    params = {}
+    if employee_id is not None:
+        filters.append('request.employee_id = :employee_id')
+        params['employee_id'] = employee_id
+    if status:
+        filters.append('request.status = :status')
+        params['status'] = status
+
+    ids = _matching_ids(terms, filters, params, limit)
+    if not ids:
+        return []
+    rows = {row.id: row for row in Request.query.filter(Request.id.in_(ids)).all()}
+    return [rows[row_id] for row_id in ids if row_id in rows]
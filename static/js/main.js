@@ -126,3 +126,161 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 });
+
+// Infinite scroll for paginated tables (dashboard, order tracking).
+// The "older" pagination link carries the JSON URL of the next page; when it
+// scrolls into view the rows are fetched and appended instead of navigating.
+function loadNextPage(link) {
+    if (link.dataset.loading) {
+        return;
+    }
+    link.dataset.loading = 'true';
+
+    fetch(link.dataset.infiniteScroll, { headers: { 'Accept': 'application/json' } })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('HTTP ' + response.status);
+            }
+            return response.json();
+        })
+        .then(data => {
+            const target = document.querySelector(link.dataset.target);
+            if (target) {
+                target.insertAdjacentHTML('beforeend', data.html);
+            }
+
+            if (data.next_url) {
+                link.dataset.infiniteScroll = data.next_url;
+                link.href = data.next_page_url;
+                delete link.dataset.loading;
+            } else {
+                link.remove();
+            }
+        })
+        .catch(error => {
+            // Fall back to the regular pagination link
+            console.error('Failed to load next page:', error);
+            delete link.dataset.loading;
+        });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const links = document.querySelectorAll('[data-infinite-scroll]');
+    if (!links.length || !('IntersectionObserver' in window)) {
+        return;
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                loadNextPage(entry.target);
+            }
+        });
+    }, { rootMargin: '200px' });
+
+    links.forEach(link => observer.observe(link));
+});
+
+// Refresh dashboard summary cards from the stats endpoint
+const STATS_POLL_INTERVAL = 30000;
+
+function refreshStats() {
+    const statsRow = document.querySelector('[data-stats-url]');
+    if (!statsRow) {
+        return;
+    }
+    fetch(statsRow.dataset.statsUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.ok ? response.json() : null)
+        .then(stats => {
+            if (!stats) {
+                return;
+            }
+            statsRow.querySelectorAll('[data-stat]').forEach(el => {
+                el.textContent = stats[el.dataset.stat] ?? 0;
+            });
+        })
+        .catch(error => console.error('Failed to refresh stats:', error));
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (!document.querySelector('[data-stats-url]')) {
+        return;
+    }
+
+    setInterval(() => {
+        if (!document.hidden) {
+            refreshStats();
+        }
+    }, STATS_POLL_INTERVAL);
+});
+
+// Live dashboard updates over Server-Sent Events: changed rows are replaced
+// in place, new requests are prepended when the first page is shown.
+function applyRequestEvent(tbody, data) {
+    if (!data.html) {
+        return;
+    }
+    const template = document.createElement('template');
+    template.innerHTML = data.html;
+    const row = template.content.querySelector('tr[data-request-id]');
+    const modal = template.content.querySelector('.modal');
+    const existing = tbody.querySelector(`tr[data-request-id="${data.request_id}"]`);
+
+    if (existing) {
+        const oldModal = document.getElementById(`requestModal${data.request_id}`);
+        if (oldModal && !oldModal.classList.contains('show')) {
+            oldModal.replaceWith(modal);
+        }
+        existing.replaceWith(row);
+    } else if (data.type === 'request_created' && tbody.dataset.liveInsert === 'true') {
+        tbody.prepend(row, modal);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const tbody = document.querySelector('[data-events-url]');
+    if (!tbody || !('EventSource' in window)) {
+        return;
+    }
+
+    const source = new EventSource(tbody.dataset.eventsUrl);
+    ['request_created', 'status_changed'].forEach(type => {
+        source.addEventListener(type, event => {
+            applyRequestEvent(tbody, JSON.parse(event.data));
+            refreshStats();
+        });
+    });
+});
+
+// Multi-select for bulk status changes on the dashboard. Row checkboxes belong
+// to #bulkStatusForm through their form attribute, so rows appended by
+// infinite scroll or live events are picked up automatically.
+function updateBulkSelection(form) {
+    const checked = document.querySelectorAll('input[name="request_ids"][form="bulkStatusForm"]:checked').length;
+    const counter = form.querySelector('[data-selected-count]');
+    if (counter) {
+        counter.textContent = 'Выбрано: ' + checked;
+    }
+    const submitBtn = form.querySelector('input[type="submit"], button[type="submit"]');
+    if (submitBtn) {
+        submitBtn.disabled = checked === 0;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('bulkStatusForm');
+    if (!form) {
+        return;
+    }
+
+    document.addEventListener('change', event => {
+        if (event.target.matches('[data-select-all]')) {
+            document.querySelectorAll('input[name="request_ids"][form="bulkStatusForm"]').forEach(box => {
+                box.checked = event.target.checked;
+            });
+        }
+        if (event.target.matches('[data-select-all], input[name="request_ids"]')) {
+            updateBulkSelection(form);
+        }
+    });
+});
@@ -0,0 +1,78 @@
+"""
+Per-employee request counters by status.
+Counters are adjusted in the same transaction as the request write, so the
+dashboard reads a handful of primary-key rows instead of aggregating requests.
+"""
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import EmployeeStatusCounter, Request
+
+STATUSES = ['pending', 'processing', 'shipped', 'delivered']
+
+def adjust_status_counter(employee_id, status, delta):
+    """Atomically add delta to an employee's counter for a status (caller commits)"""
+    if employee_id is None or not delta:
+        return
+    updated = EmployeeStatusCounter.query.filter_by(employee_id=employee_id, status=status) \
+        .update({EmployeeStatusCounter.count: EmployeeStatusCounter.count + delta},
+                synchronize_session=False)
+    if updated:
+        return
+    try:
+        # First request in this status: create the row, another worker may race us
+        with db.session.begin_nested():
+            db.session.add(EmployeeStatusCounter(employee_id=employee_id, status=status, count=delta))
+    except IntegrityError:
+        EmployeeStatusCounter.query.filter_by(employee_id=employee_id, status=status) \
+            .update({EmployeeStatusCounter.count: EmployeeStatusCounter.count + delta},
+                    synchronize_session=False)
+
+def record_status_change(employee_id, old_status, new_status):
+    """Move one request between status counters"""
+    if old_status == new_status:
+        return
+    adjust_status_counter(employee_id, old_status, -1)
+    adjust_status_counter(employee_id, new_status, 1)
+
+def employee_status_counts(employee_id):
+    """
+    Read an employee's maintained counters
+
+    Returns:
+        dict: status -> count for every known status, plus 'total'
+    """
+    counts = dict.fromkeys(STATUSES, 0)
+    rows = db.session.query(EmployeeStatusCounter.status, EmployeeStatusCounter.count) \
+        .filter(EmployeeStatusCounter.employee_id == employee_id).all()
+    for status, count in rows:
+        counts[status] = count
+    counts['total'] = sum(count for status, count in rows)
+    return counts
+
+def aggregate_status_counts(employee_id=None):
+    """
+    Count requests per (employee, status) with a single GROUP BY query
+
+    Returns:
+        list of (employee_id, status, count) tuples
+    """
+    query = db.session.query(Request.employee_id, Request.status, func.count(Request.id)) \
+        .filter(Request.employee_id.isnot(None))
+    if employee_id is not None:
+        query = query.filter(Request.employee_id == employee_id)
+    return query.group_by(Request.employee_id, Request.status).all()
+
+def rebuild_status_counters(employee_id=None):
+    """Recompute counters from the requests table, e.g. after a manual data fix"""
+    delete = EmployeeStatusCounter.query
+    if employee_id is not None:
+        delete = delete.filter_by(employee_id=employee_id)
+    delete.delete(synchronize_session=False)
+    rows = aggregate_status_counts(employee_id)
+    db.session.add_all(EmployeeStatusCounter(employee_id=emp_id, status=status, count=count)
+                       for emp_id, status, count in rows if status is not None)
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,183 @@
+"""
+Status transition history and time-in-status analytics.
+Every status change appends a request_status_history row carrying the time
+the request spent in its previous status. Those durations are folded into
+per (delivery_type, status) histograms incrementally: a refresh only reads
+history rows past the stored watermark, so reports never scan the whole log.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from models import RequestStatusHistory, RollupState, StatusDurationBucket
+from config import STATUS_ROLLUP_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_NAME = 'status_durations'
+REFRESH_BATCH_SIZE = 10000
+REPORT_PERCENTILES = (0.5, 0.9, 0.95)
+
+# Histogram upper bounds in seconds: 5 min ... 30 days, then overflow
+DURATION_BUCKETS = (
+    300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600, 12 * 3600,
+    86400, 2 * 86400, 3 * 86400, 5 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+)
+
+def history_row(request_id, delivery_type, old_status, new_status, changed_by, changed_at, status_since):
+    """Values of one history row, for bulk inserts"""
+    return {
+        'request_id': request_id,
+        'delivery_type': delivery_type,
+        'from_status': old_status,
+        'to_status': new_status,
+        'changed_by': changed_by,
+        'changed_at': changed_at,
+        'seconds_in_status': (changed_at - status_since).total_seconds() if status_since else None,
+    }
+
+def record_status_transition(request_obj, old_status, changed_by):
+    """
+    Log a status change of one request and restart its time-in-status clock.
+    Call after assigning the new status; the caller commits.
+    """
+    now = datetime.utcnow()
+    db.session.add(RequestStatusHistory(**history_row(
+        request_obj.id, request_obj.delivery_type, old_status, request_obj.status,
+        changed_by, now, request_obj.status_changed_at)))
+    request_obj.status_changed_at = now
+
+def bucket_index(seconds):
+    """Histogram bucket of a duration"""
+    for i, bound in enumerate(DURATION_BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(DURATION_BUCKETS)
+
+def _add_to_bucket(delivery_type, status, bucket, count, total_seconds):
+    key = dict(delivery_type=delivery_type, status=status, bucket=bucket)
+    values = {StatusDurationBucket.count: StatusDurationBucket.count + count,
+              StatusDurationBucket.total_seconds: StatusDurationBucket.total_seconds + total_seconds}
+    if StatusDurationBucket.query.filter_by(**key).update(values, synchronize_session=False):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(StatusDurationBucket(count=count, total_seconds=total_seconds, **key))
+    except IntegrityError:
+        StatusDurationBucket.query.filter_by(**key).update(values, synchronize_session=False)
+
+def refresh_status_rollups(batch_size=REFRESH_BATCH_SIZE):
+    """
+    Fold history rows added since the last refresh into the duration histograms.
+    Each batch and its watermark commit together; if another worker advanced
+    the watermark first, this batch is rolled back and nothing is counted twice.
+    Rows younger than STATUS_ROLLUP_LAG_SECONDS are left for the next refresh,
+    so a transaction that took a lower id but commits later is not skipped.
+
+    Returns:
+        Number of history rows processed
+    """
+    processed = 0
+    cutoff = datetime.utcnow() - timedelta(seconds=STATUS_ROLLUP_LAG_SECONDS)
+    while True:
+        state = db.session.get(RollupState, ROLLUP_NAME)
+        if state is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(RollupState(name=ROLLUP_NAME, last_id=0))
+            except IntegrityError:
+                pass
+            state = db.session.get(RollupState, ROLLUP_NAME)
+        last_id = state.last_id
+
+        rows = db.session.query(
+            RequestStatusHistory.id, RequestStatusHistory.delivery_type,
+            RequestStatusHistory.from_status, RequestStatusHistory.seconds_in_status,
+            RequestStatusHistory.changed_at,
+        ).filter(RequestStatusHistory.id > last_id).order_by(RequestStatusHistory.id).limit(batch_size).all()
+        fetched = len(rows)
+        settled = next((i for i, row in enumerate(rows) if row.changed_at >= cutoff), fetched)
+        rows = rows[:settled]
+        if not rows:
+            db.session.commit()
+            return processed
+
+        totals = defaultdict(lambda: [0, 0.0])
+        for row in rows:
+            if row.seconds_in_status is None:
+                continue
+            total = totals[(row.delivery_type, row.from_status, bucket_index(row.seconds_in_status))]
+            total[0] += 1
+            total[1] += row.seconds_in_status
+        for (delivery_type, status, bucket), (count, total_seconds) in totals.items():
+            _add_to_bucket(delivery_type, status, bucket, count, total_seconds)
+
+        advanced = RollupState.query.filter_by(name=ROLLUP_NAME, last_id=last_id).update({
+            RollupState.last_id: rows[-1].id,
+            RollupState.updated_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        if not advanced:
+            db.session.rollback()
+            continue
+        db.session.commit()
+        processed += len(rows)
+        if len(rows) < fetched or fetched < batch_size:
+            return processed
+
+def rebuild_status_rollups():
+    """Drop the histograms and fold the whole history again"""
+    StatusDurationBucket.query.delete(synchronize_session=False)
+    RollupState.query.filter_by(name=ROLLUP_NAME).delete(synchronize_session=False)
+    db.session.commit()
+    processed = refresh_status_rollups()
+    logger.info(f"Rebuilt time-in-status rollups from {processed} history rows")
+    return processed
+
+def _bucket_percentile(buckets, total, fraction):
+    """Percentile estimated by linear interpolation inside the histogram bucket"""
+    rank = fraction * total
+    seen = 0
+    for bucket, count in buckets:
+        if count and seen + count >= rank:
+            lower = DURATION_BUCKETS[bucket - 1] if bucket > 0 else 0
+            if bucket >= len(DURATION_BUCKETS):
+                return lower
+            return lower + (DURATION_BUCKETS[bucket] - lower) * (rank - seen) / count
+        seen += count
+    return None
+
+def status_time_report():
+    """
+    Time-in-status statistics per delivery type, refreshing the rollups first
+
+    Returns:
+        dict: delivery_type -> status -> {'count', 'mean_seconds', 'p50_seconds', 'p90_seconds', 'p95_seconds'}
+    """
+    refresh_status_rollups()
+    grouped = defaultdict(list)
+    for row in StatusDurationBucket.query.order_by(StatusDurationBucket.bucket).all():
+        grouped[(row.delivery_type, row.status)].append(row)
+
+    report = defaultdict(dict)
+    for (delivery_type, status), rows in grouped.items():
+        total = sum(row.count for row in rows)
+        if not total:
+            continue
+        buckets = [(row.bucket, row.count) for row in rows]
+        stats = {'count': total, 'mean_seconds': sum(row.total_seconds for row in rows) / total}
+        for fraction in REPORT_PERCENTILES:
+            stats[f'p{int(fraction * 100)}_seconds'] = _bucket_percentile(buckets, total, fraction)
+        report[delivery_type][status] = stats
+    return dict(report)
+
+@app.cli.command('refresh-status-rollups')
+@click.option('--rebuild', is_flag=True, help='Recompute from the whole history')
+def refresh_status_rollups_command(rebuild):
+    """Fold new status history rows into the time-in-status histograms"""
+    processed = rebuild_status_rollups() if rebuild else refresh_status_rollups()
+    click.echo(f"Processed {processed} status history rows")
@@ -0,0 +1,119 @@
+"""
+Bulk status transitions.
+A whole selection of requests moves to the next status with one SELECT and
+one guarded set-based UPDATE; counters, events, status history and a single
+aggregated notification are written in the same transaction.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+
+from app import db
+from models import Request, RequestEvent, RequestStatusHistory
+from notification_worker import STATUS_UPDATE, enqueue_notification
+from status_counters import adjust_status_counter
+from status_history import history_row
+
+# Requests move forward one step at a time: pending -> processing -> shipped -> delivered
+PREVIOUS_STATUS = {
+    'processing': 'pending',
+    'shipped': 'processing',
+    'delivered': 'shipped',
+}
+
+# Per-request outcomes
+UPDATED = 'updated'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+UNCHANGED = 'unchanged'
+INVALID_TRANSITION = 'invalid_transition'
+CONFLICT = 'conflict'
+
+BulkResult = namedtuple('BulkResult', ['results', 'updated_phones'])
+
+def bulk_update_status(employee, request_ids, new_status):
+    """
+    Move several of an employee's requests to new_status (caller commits)
+
+    Args:
+        employee: Employee performing the change
+        request_ids: Iterable of request ids
+        new_status: Target status
+
+    Returns:
+        BulkResult: results maps each id to an outcome, updated_phones holds the
+        normalized phones of changed requests for cache invalidation
+    """
+    request_ids = list(dict.fromkeys(request_ids))
+    previous = PREVIOUS_STATUS.get(new_status)
+
+    rows = {}
+    if request_ids:
+        rows = {row.id: row for row in db.session.query(
+            Request.id, Request.employee_id, Request.status, Request.customer_name,
+            Request.delivery_type, Request.customer_phone_normalized, Request.status_changed_at,
+        ).filter(Request.id.in_(request_ids))}
+
+    results = {}
+    eligible = []
+    for request_id in request_ids:
+        row = rows.get(request_id)
+        if row is None:
+            results[request_id] = NOT_FOUND
+        elif row.employee_id != employee.id:
+            results[request_id] = FORBIDDEN
+        elif row.status == new_status:
+            results[request_id] = UNCHANGED
+        elif previous is None or row.status != previous:
+            results[request_id] = INVALID_TRANSITION
+        else:
+            eligible.append(request_id)
+
+    updated = []
+    now = datetime.utcnow()
+    if eligible:
+        # Re-check ownership and status in the UPDATE itself so a concurrent change is not overwritten
+        statement = db.update(Request).where(
+            Request.id.in_(eligible),
+            Request.employee_id == employee.id,
+            Request.status == previous,
+        ).values(status=new_status, status_changed_at=now).execution_options(synchronize_session=False)
+        if db.engine.dialect.update_returning:
+            updated = [row[0] for row in db.session.execute(statement.returning(Request.id))]
+        elif db.session.execute(statement).rowcount == len(eligible):
+            updated = eligible
+        else:
+            updated = [row.id for row in db.session.query(Request.id).filter(
+                Request.id.in_(eligible), Request.status == new_status)]
+
+    updated_ids = set(updated)
+    for request_id in eligible:
+        results[request_id] = UPDATED if request_id in updated_ids else CONFLICT
+
+    if updated:
+        adjust_status_counter(employee.id, previous, -len(updated))
+        adjust_status_counter(employee.id, new_status, len(updated))
+        db.session.execute(db.insert(RequestEvent), [{
+            'request_id': request_id,
+            'employee_id': employee.id,
+            'event_type': 'status_changed',
+            'old_status': previous,
+            'new_status': new_status,
+        } for request_id in updated])
+        db.session.execute(db.insert(RequestStatusHistory), [
+            history_row(request_id, rows[request_id].delivery_type, previous, new_status,
+                        employee.id, now, rows[request_id].status_changed_at)
+            for request_id in updated])
+        enqueue_notification({
+            'new_status': new_status,
+            'old_status': previous,
+            'employee': employee.username,
+            'requests': [{
+                'id': request_id,
+                'customer_name': rows[request_id].customer_name,
+                'delivery_type': rows[request_id].delivery_type,
+            } for request_id in updated],
+        }, STATUS_UPDATE)
+
+    results = {request_id: results[request_id] for request_id in request_ids}
+    return BulkResult(results, {rows[request_id].customer_phone_normalized for request_id in updated})
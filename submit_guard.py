@@ -0,0 +1,217 @@
+"""
+Guards for the public request form.
+
+Token buckets per client IP and per phone number throttle submissions, and a
+hash of the submitted fields collapses repeats (double clicks, resent forms,
+retrying bots) into the first request before anything reaches the database or
+the Telegram outbox. Limits and duplicates must hold across gunicorn workers,
+so state lives in a local SQLite file under the instance folder unless
+SUBMIT_GUARD_BACKEND says otherwise ('memory' only suits a single process).
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from app import app
+from cache import create_cache
+from models import normalize_phone
+from config import (
+    SUBMIT_GUARD_BACKEND,
+    SUBMIT_IP_BURST,
+    SUBMIT_IP_PER_MINUTE,
+    SUBMIT_PHONE_BURST,
+    SUBMIT_PHONE_PER_MINUTE,
+    SUBMIT_DEDUP_WINDOW,
+)
+
+# Buckets that are full again are dropped at most this often
+PRUNE_INTERVAL = 60
+DEDUP_MAX_ENTRIES = 10000
+
+# Stored for a submission that is still being saved
+PENDING = 0
+
+def _refill(tokens, updated_at, now, burst, rate):
+    """Tokens after refilling since updated_at, capped at the burst size"""
+    return min(burst, tokens + (now - updated_at) * rate)
+
+def _take(tokens, burst, rate, now):
+    """
+    Take one token from a refilled bucket
+
+    Returns:
+        tuple: (tokens left, time the bucket is full again, seconds to wait or 0 if taken)
+    """
+    if tokens >= 1:
+        tokens -= 1
+        wait = 0.0
+    else:
+        wait = (1 - tokens) / rate
+    return tokens, now + (burst - tokens) / rate, wait
+
+class MemoryBuckets:
+    """Per-process token buckets"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.monotonic()
+
+    def take(self, key, burst, rate):
+        """Take a token for key; returns 0 when taken, else seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+                self._pruned_at = now
+            tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+            tokens, full_at, wait = _take(_refill(tokens, updated_at, now, burst, rate), burst, rate, now)
+            self._buckets[key] = (tokens, now, full_at)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+class SQLiteBuckets:
+    """Token buckets in a local SQLite file shared by all worker processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or forked processes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS token_bucket ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                'updated_at REAL NOT NULL, full_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_token_bucket_full_at ON token_bucket (full_at)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.pruned_at = time.time()
+        return conn
+
+    def take(self, key, burst, rate):
+        """Take a token for key; returns 0 when taken, else seconds until one is available"""
+        conn = self._connection()
+        now = time.time()
+        # Write lock up front so no other worker reads the bucket between our read and write
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if now - self._local.pruned_at > PRUNE_INTERVAL:
+                conn.execute('DELETE FROM token_bucket WHERE full_at < ?', (now,))
+                self._local.pruned_at = now
+            row = conn.execute('SELECT tokens, updated_at FROM token_bucket WHERE key = ?', (key,)).fetchone()
+            tokens, updated_at = row if row else (burst, now)
+            tokens, full_at, wait = _take(_refill(tokens, updated_at, now, burst, rate), burst, rate, now)
+            conn.execute(
+                'INSERT OR REPLACE INTO token_bucket (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)',
+                (key, tokens, now, full_at),
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def clear(self):
+        self._connection().execute('DELETE FROM token_bucket')
+
+def create_buckets(backend):
+    """
+    Build token buckets from a backend spec
+
+    Args:
+        backend: 'memory' or 'sqlite:///path/to/guard.db'
+
+    Returns:
+        Buckets instance
+    """
+    if backend == 'memory':
+        return MemoryBuckets()
+    if backend.startswith('sqlite:///'):
+        return SQLiteBuckets(backend[len('sqlite:///'):])
+    raise ValueError(f"Unknown submit guard backend: {backend}")
+
+# (burst, submissions per minute) per throttled dimension
+SUBMIT_LIMITS = {
+    'ip': (SUBMIT_IP_BURST, SUBMIT_IP_PER_MINUTE),
+    'phone': (SUBMIT_PHONE_BURST, SUBMIT_PHONE_PER_MINUTE),
+}
+
+def _default_backend():
+    os.makedirs(app.instance_path, exist_ok=True)
+    return 'sqlite:///' + os.path.join(app.instance_path, 'submit_guard.db')
+
+guard_backend = SUBMIT_GUARD_BACKEND or _default_backend()
+submit_buckets = create_buckets(guard_backend)
+# Content hash of recent submissions -> request id (PENDING while it is saved)
+recent_submissions = create_cache(guard_backend, default_ttl=SUBMIT_DEDUP_WINDOW,
+                                  max_entries=DEDUP_MAX_ENTRIES)
+
+def throttle_submission(dimension, value):
+    """
+    Take a token from the submission bucket of a client IP or phone
+
+    Args:
+        dimension: 'ip' or 'phone'
+        value: Client IP or normalized phone number
+
+    Returns:
+        float: 0 if the submission may proceed, else seconds until it may
+    """
+    burst, per_minute = SUBMIT_LIMITS[dimension]
+    if not value or burst <= 0 or per_minute <= 0:
+        return 0.0
+    return submit_buckets.take(f"{dimension}:{value}", burst, per_minute / 60)
+
+def _canonical(value):
+    if value is None:
+        return ''
+    return ' '.join(str(value).split()).casefold()
+
+def submission_key(form):
+    """Hash of a request form's fields, insensitive to case and whitespace"""
+    parts = [
+        form.delivery_type.data,
+        normalize_phone(form.customer_phone.data),
+        form.customer_name.data,
+        form.customer_address.data,
+        form.cargo_description.data,
+        form.cargo_weight.data,
+        form.cargo_volume.data,
+        form.preferred_delivery_date.data,
+        form.special_instructions.data,
+    ]
+    text = '\x1f'.join(_canonical(part) for part in parts)
+    return 'submit:' + hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def claim_submission(key):
+    """
+    Register a submission unless the same one arrived within SUBMIT_DEDUP_WINDOW
+
+    Returns:
+        None for a new submission, otherwise the id of the request it repeats
+        (PENDING while that one is still being saved)
+    """
+    if recent_submissions.add(key, PENDING):
+        return None
+    return recent_submissions.get(key, PENDING)
+
+def complete_submission(key, request_id):
+    """Point a claimed submission at the request it created"""
+    recent_submissions.set(key, request_id)
+
+def release_submission(key):
+    """Forget a claimed submission that was not saved, so it can be retried"""
+    recent_submissions.delete(key)
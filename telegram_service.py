@@ -2,14 +2,118 @@
 Telegram notification service for sending shipping request alerts
 """
 
+import html
+import os
+import re
+import threading
+import time
 import requests
 import logging
-from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, validate_telegram_config
+from requests.adapters import HTTPAdapter
+from config import (
+    TELEGRAM_BOT_TOKEN,
+    TELEGRAM_CHAT_ID,
+    TELEGRAM_API_URL,
+    TELEGRAM_TIMEOUT,
+    TELEGRAM_POOL_SIZE,
+    LOG_LEVEL,
+    validate_telegram_config,
+)
+from metrics import registry as metrics
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# Telegram rejects messages longer than this
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+_session = None
+_session_pid = None
+
+def _html(value):
+    """Escape a user-supplied value for a parse_mode HTML message"""
+    return html.escape(str(value))
+
+def _truncate_html(text, limit):
+    """Cut escaped text to limit characters without leaving half an entity like '&am'"""
+    if len(text) <= limit:
+        return text
+    return re.sub(r'&[^;\s]*$', '', text[:limit])
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Return the shared keep-alive HTTP session for this process.
+    A new session is created after a fork so gunicorn workers never share sockets.
+    
+    Returns:
+        requests.Session with a connection pool mounted for the Telegram API
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TELEGRAM_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+            _session_pid = pid
+    return _session
+
+def _api_url(method):
+    """Build a Bot API method URL"""
+    return f"{TELEGRAM_API_URL.rstrip('/')}/bot{TELEGRAM_BOT_TOKEN}/{method}"
+
+def _api_call(method, http_method='post', **kwargs):
+    """
+    Call a Bot API method over the shared session, recording latency and outcome
+    
+    Returns:
+        requests.Response
+    """
+    start = time.perf_counter()
+    outcome = 'exception'
+    try:
+        response = getattr(get_http_session(), http_method)(_api_url(method), timeout=TELEGRAM_TIMEOUT, **kwargs)
+        outcome = 'ok' if response.status_code == 200 else 'http_error'
+        return response
+    finally:
+        metrics.observe('telegram_api_duration_seconds', time.perf_counter() - start, {'method': method})
+        metrics.inc('telegram_api_requests_total', {'method': method, 'outcome': outcome})
+
+def _send_message(message_text):
+    """
+    Send one HTML message to the configured chat over the shared session
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    payload = {
+        'chat_id': TELEGRAM_CHAT_ID,
+        'text': message_text,
+        'parse_mode': 'HTML',
+        'disable_web_page_preview': True
+    }
+    
+    response = _api_call('sendMessage', data=payload)
+    
+    if response.status_code == 200:
+        response_data = response.json()
+        if response_data.get('ok'):
+            logger.info("Telegram notification sent successfully")
+            return True, "Notification sent successfully"
+        else:
+            error_msg = response_data.get('description', 'Unknown error')
+            logger.error(f"Telegram API error: {error_msg}")
+            return False, f"Telegram API error: {error_msg}"
+    else:
+        logger.error(f"HTTP error {response.status_code}: {response.text}")
+        return False, f"HTTP error {response.status_code}"
+
 def format_request_message(request_data, delivery_type):
     """
     Format shipping request data into a detailed Telegram message
@@ -31,21 +135,21 @@ def format_request_message(request_data, delivery_type):
 
 📋 <b>Тип:</b> {delivery_types.get(delivery_type, 'Неизвестно')}
 
-👤 <b>Заказчик:</b> {request_data.get('customer_name', 'Не указано')}
-📞 <b>Телефон:</b> {request_data.get('customer_phone', 'Не указано')}
-🏠 <b>Адрес:</b> {request_data.get('customer_address', 'Не указано')}
+👤 <b>Заказчик:</b> {_html(request_data.get('customer_name', 'Не указано'))}
+📞 <b>Телефон:</b> {_html(request_data.get('customer_phone', 'Не указано'))}
+🏠 <b>Адрес:</b> {_html(request_data.get('customer_address', 'Не указано'))}
 
 📦 <b>Детали груза:</b>
-{request_data.get('cargo_description', 'Не указано')}
+{_html(request_data.get('cargo_description', 'Не указано'))}
 
-⚖️ <b>Вес:</b> {request_data.get('cargo_weight', 'Не указано')} кг
-📏 <b>Объем:</b> {request_data.get('cargo_volume', 'Не указано')} м³
+⚖️ <b>Вес:</b> {_html(request_data.get('cargo_weight', 'Не указано'))} кг
+📏 <b>Объем:</b> {_html(request_data.get('cargo_volume', 'Не указано'))} м³
 
-📅 <b>Предпочитаемая дата доставки:</b> {request_data.get('preferred_delivery_date', 'Не указано')}
+📅 <b>Предпочитаемая дата доставки:</b> {_html(request_data.get('preferred_delivery_date', 'Не указано'))}
 
-💬 <b>Особые требования:</b> {request_data.get('special_instructions', 'Нет') if request_data.get('special_instructions') else 'Нет'}
+💬 <b>Особые требования:</b> {_html(request_data.get('special_instructions') or 'Нет')}
 
-⏰ <b>Время подачи заявки:</b> {request_data.get('created_at', 'Только что')}
+⏰ <b>Время подачи заявки:</b> {_html(request_data.get('created_at', 'Только что'))}
 """
     
     return message.strip()
@@ -68,34 +172,167 @@ def send_telegram_notification(request_data, delivery_type):
             logger.warning(f"Telegram configuration invalid: {config_message}")
             return False, f"Configuration error: {config_message}"
         
-        # Format message
+        # Format and send message
         message_text = format_request_message(request_data, delivery_type)
+        return _send_message(message_text)
+            
+    except requests.exceptions.Timeout:
+        logger.error("Telegram API request timeout")
+        return False, "Request timeout"
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request error: {str(e)}")
+        return False, f"Request error: {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        return False, f"Unexpected error: {str(e)}"
+
+def format_digest_entry(request_data, delivery_type):
+    """
+    Format one request as a compact digest entry
+    
+    Args:
+        request_data: Dictionary containing request information
+        delivery_type: 'astana' or 'regions'
+    
+    Returns:
+        Formatted entry string
+    """
+    delivery_types = {
+        'astana': '🏢 Астана',
+        'regions': '🌍 Регионы'
+    }
+    
+    return (
+        f"<b>№{_html(request_data.get('request_id', '?'))}</b> · {delivery_types.get(delivery_type, 'Неизвестно')} · "
+        f"{_html(request_data.get('created_at', 'Только что'))}\n"
+        f"👤 {_html(request_data.get('customer_name', 'Не указано'))}, "
+        f"📞 {_html(request_data.get('customer_phone', 'Не указано'))}\n"
+        f"🏠 {_html(request_data.get('customer_address', 'Не указано'))}\n"
+        f"📦 {_html(request_data.get('cargo_description', 'Не указано'))}"
+    )
+
+def format_digest_messages(items):
+    """
+    Format several requests into digest messages that fit Telegram's length limit
+    
+    Args:
+        items: List of (request_data, delivery_type) tuples
+    
+    Returns:
+        List of (message string, number of items it contains), in item order
+    """
+    header = f"🚚 <b>Новые заявки на отгрузку: {len(items)}</b>"
+    messages = []
+    current = header
+    count = 0
+    for request_data, delivery_type in items:
+        entry = _truncate_html(format_digest_entry(request_data, delivery_type),
+                               TELEGRAM_MESSAGE_LIMIT - len(header) - 2)
+        if count and len(current) + len(entry) + 2 > TELEGRAM_MESSAGE_LIMIT:
+            messages.append((current, count))
+            current = header
+            count = 0
+        current = f"{current}\n\n{entry}"
+        count += 1
+    messages.append((current, count))
+    return messages
+
+def send_telegram_digest(items):
+    """
+    Send several shipping requests as one digest notification
+    
+    A long digest goes out as several messages; they are sent in order and
+    sending stops at the first failure, so the delivered items are a prefix.
+    
+    Args:
+        items: List of (request_data, delivery_type) tuples
+    
+    Returns:
+        tuple: (success: bool, message: str, delivered: int items whose message was sent)
+    """
+    if len(items) == 1:
+        success, message = send_telegram_notification(*items[0])
+        return success, message, 1 if success else 0
+    
+    delivered = 0
+    try:
+        # Validate configuration
+        is_valid, config_message = validate_telegram_config()
+        if not is_valid:
+            logger.warning(f"Telegram configuration invalid: {config_message}")
+            return False, f"Configuration error: {config_message}", 0
         
-        # Prepare API request
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        
-        payload = {
-            'chat_id': TELEGRAM_CHAT_ID,
-            'text': message_text,
-            'parse_mode': 'HTML',
-            'disable_web_page_preview': True
-        }
-        
-        # Send request
-        response = requests.post(url, data=payload, timeout=10)
+        for message_text, count in format_digest_messages(items):
+            success, message = _send_message(message_text)
+            if not success:
+                return False, message, delivered
+            delivered += count
+        return True, f"Digest of {len(items)} notifications sent successfully", delivered
+            
+    except requests.exceptions.Timeout:
+        logger.error("Telegram API request timeout")
+        return False, "Request timeout", delivered
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request error: {str(e)}")
+        return False, f"Request error: {str(e)}", delivered
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        return False, f"Unexpected error: {str(e)}", delivered
+
+def format_status_update_messages(update):
+    """
+    Format one bulk status change as messages that fit Telegram's length limit
+    
+    Args:
+        update: Dictionary with 'new_status', 'employee' and 'requests' (list of id/customer_name/delivery_type)
+    
+    Returns:
+        List of formatted message strings
+    """
+    status_names = {
+        'pending': '⏳ Ожидает',
+        'processing': '⚙️ В обработке',
+        'shipped': '🚚 Отправлено',
+        'delivered': '✅ Доставлено'
+    }
+    
+    header = (
+        f"🔄 <b>Статус изменен: {_html(status_names.get(update.get('new_status'), update.get('new_status')))}</b>\n"
+        f"👷 {_html(update.get('employee', 'Не указано'))} · заявок: {len(update.get('requests', []))}"
+    )
+    messages = []
+    current = header
+    for item in update.get('requests', []):
+        entry = f"№{_html(item.get('id'))} · {_html(item.get('customer_name', 'Не указано'))}"
+        if len(current) + len(entry) + 1 > TELEGRAM_MESSAGE_LIMIT:
+            messages.append(current)
+            current = header
+        current = f"{current}\n{entry}"
+    messages.append(current)
+    return messages
+
+def send_status_update_notification(update):
+    """
+    Send one aggregated notification about a bulk status change
+    
+    Args:
+        update: Dictionary as accepted by format_status_update_messages
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    try:
+        # Validate configuration
+        is_valid, config_message = validate_telegram_config()
+        if not is_valid:
+            logger.warning(f"Telegram configuration invalid: {config_message}")
+            return False, f"Configuration error: {config_message}"
         
-        if response.status_code == 200:
-            response_data = response.json()
-            if response_data.get('ok'):
-                logger.info("Telegram notification sent successfully")
-                return True, "Notification sent successfully"
-            else:
-                error_msg = response_data.get('description', 'Unknown error')
-                logger.error(f"Telegram API error: {error_msg}")
-                return False, f"Telegram API error: {error_msg}"
-        else:
-            logger.error(f"HTTP error {response.status_code}: {response.text}")
-            return False, f"HTTP error {response.status_code}"
+        for message_text in format_status_update_messages(update):
+            success, message = _send_message(message_text)
+            if not success:
+                return False, message
+        return True, "Status update notification sent successfully"
             
     except requests.exceptions.Timeout:
         logger.error("Telegram API request timeout")
@@ -121,8 +358,7 @@ def test_telegram_connection():
             return False, f"Configuration error: {config_message}"
         
         # Test bot info
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getMe"
-        response = requests.get(url, timeout=10)
+        response = _api_call('getMe', http_method='get')
         
         if response.status_code == 200:
             data = response.json()
@@ -0,0 +1,75 @@
+"""
+Telegram messages use parse_mode HTML: user input must not break their markup
+"""
+
+import re
+from html.parser import HTMLParser
+
+import telegram_service
+
+BAD_NAME = 'ООО "А&Б" <опт>'
+
+class _TagCollector(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.tags = []
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.append(tag)
+
+def is_valid_telegram_html(text):
+    """Only <b> tags and well-formed entities, like Telegram's HTML parser accepts"""
+    if re.search(r'&(?!(?:amp|lt|gt|quot|#\d+);)', text):
+        return False
+    collector = _TagCollector()
+    collector.feed(text)
+    collector.close()
+    return set(collector.tags) <= {'b'} and text.count('<b>') == text.count('</b>')
+
+def _request(number, name='Покупатель'):
+    return {
+        'request_id': number,
+        'customer_name': name,
+        'customer_phone': '+77010000000',
+        'customer_address': 'г. Астана, ул. <Тестовая> & 1',
+        'cargo_description': 'Груз ' + 'x' * 400,
+        'special_instructions': '<script>',
+    }
+
+def test_request_message_escapes_user_fields():
+    message = telegram_service.format_request_message(_request(1, BAD_NAME), 'astana')
+    assert is_valid_telegram_html(message)
+    assert 'ООО &quot;А&amp;Б&quot; &lt;опт&gt;' in message
+
+def test_digest_entry_escapes_user_fields():
+    assert is_valid_telegram_html(telegram_service.format_digest_entry(_request(1, BAD_NAME), 'regions'))
+
+def test_status_update_escapes_names():
+    update = {'new_status': 'shipped', 'employee': 'Иванов <склад>',
+              'requests': [{'id': 1, 'customer_name': BAD_NAME, 'delivery_type': 'astana'}]}
+    for message in telegram_service.format_status_update_messages(update):
+        assert is_valid_telegram_html(message)
+
+def test_bad_name_does_not_block_rest_of_digest(monkeypatch):
+    sent = []
+
+    def fake_send(text):
+        # Telegram refuses the whole message when it cannot parse the entities
+        if not is_valid_telegram_html(text):
+            return False, "Bad Request: can't parse entities"
+        sent.append(text)
+        return True, 'ok'
+
+    monkeypatch.setattr(telegram_service, '_send_message', fake_send)
+    monkeypatch.setattr(telegram_service, 'validate_telegram_config', lambda: (True, 'ok'))
+    items = [(_request(number, BAD_NAME if number == 3 else 'Покупатель'), 'astana') for number in range(40)]
+
+    success, message, delivered = telegram_service.send_telegram_digest(items)
+
+    assert success, message
+    assert delivered == len(items)
+    assert len(sent) > 1
+
+def test_truncation_does_not_split_entities():
+    text = 'a' * 10 + '&amp;'
+    assert telegram_service._truncate_html(text, 13) == 'a' * 10